@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collector import Collector, Text
+from recogniser import recognise
+from instrumentation import Instrumentation, Metrics
+from search import SearchIndex
+from corpus import Corpus
+from references import write_references
+from similarity import write_similarities
+
+
+def pdf_files(sources:list[str]) -> list[str]:
+    result = []
+    for source in sources:
+        if os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.lower().endswith('.pdf'):
+                    result.append(os.path.join(source, name))
+        elif source.lower().endswith('.pdf'):
+            result.append(source)
+        else:
+            base = os.path.dirname(source)
+            with open(source, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line != '' and not line.startswith('#'):
+                        result.append(os.path.join(base, line))
+    return result
+
+
+def ingest(pdf_filename:str, out_dir:str = None, metrics:bool = False) -> dict:
+    result = {'file': pdf_filename, 'error': None}
+    instrumentation = Instrumentation() if metrics else None
+    start = time.perf_counter()
+    try:
+        # the frames end up holding the whole text anyway, so keep every page instead of re-extracting evicted ones
+        text = Text(pdf_filename, window=sys.maxsize)
+        while text.fetch():
+            pass
+        result['extract_seconds'] = time.perf_counter() - start
+        collector = Collector(pdf_filename, text)
+        t = time.perf_counter()
+        if instrumentation is not None:
+            collector.instrument(instrumentation)
+            doubts = instrumentation.timed('recognise', recognise)(collector)
+        else:
+            doubts = recognise(collector)
+        result['recognise_seconds'] = time.perf_counter() - t
+        t = time.perf_counter()
+        name = collector.file_name
+        if out_dir is not None:
+            name = os.path.join(out_dir, os.path.basename(name))
+        collector.serialize(name + '.json')
+        collector.save(name + '.ttl')
+        SearchIndex(collector).save(name + '.index.json')
+        result['write_seconds'] = time.perf_counter() - t
+        result['json'] = name + '.json'
+        result['ttl'] = name + '.ttl'
+        result['index'] = name + '.index.json'
+        result['lines'] = text.length()
+        result['frames'] = collector.length()
+        result['doubts'] = [str(d) for d in doubts]
+    except Exception as e:
+        result['error'] = repr(e)
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    if instrumentation is not None:
+        result['metrics'] = instrumentation.metrics.state()
+    return result
+
+
+def run(files:list[str], out_dir:str = None, workers:int = None, metrics:Metrics = None) -> dict:
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest, f, out_dir, metrics is not None): f for f in files}
+        for future in as_completed(futures):
+            try:
+                r = future.result()
+            except Exception as e:
+                r = {'file': futures[future], 'error': repr(e), 'seconds': None}
+            if metrics is not None and 'metrics' in r:
+                metrics.merge(r.pop('metrics'))
+            results.append(r)
+            status = 'FAILED ' + r['error'] if r['error'] else str(r['frames']) + ' frames, ' + str(len(r['doubts'])) + ' doubts'
+            print("{:>8.2f}s {} {}".format(r['seconds'] or 0, r['file'], status))
+    results.sort(key=lambda r: r['file'])
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if r['error']]
+    return {
+        'workers': workers or os.cpu_count(),
+        'files': len(results),
+        'failed': len(failed),
+        'seconds': elapsed,
+        'cpu_seconds': sum(r['seconds'] or 0 for r in results),
+        'results': results
+    }
+
+
+def add_to_corpus(report:dict, corpus_file:str):
+    corpus = Corpus(corpus_file)
+    try:
+        for r in report['results']:
+            if r['error']:
+                continue
+            try:
+                corpus.add_file(r['json'])
+            except Exception as e:
+                r['error'] = 'corpus: ' + repr(e)
+                r['traceback'] = traceback.format_exc()
+                report['failed'] += 1
+                print("{:>8.2f}s {} FAILED {}".format(r['seconds'] or 0, r['file'], r['error']))
+    finally:
+        corpus.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recognise and export a batch of PDF acts in parallel.")
+    parser.add_argument('sources', nargs='+', help="PDF files, directories of PDFs or manifest files listing PDFs")
+    parser.add_argument('-o', '--out', default=None, help="output directory for .json/.ttl files (default: next to each PDF)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument('-r', '--report', default='report.json', help="summary report file")
+    parser.add_argument('-c', '--corpus', default=None, help="also add every recognised act to this SQLite corpus")
+    parser.add_argument('-x', '--references', action='store_true', help="resolve citations across the whole batch and write a <name>.refs.ttl per act")
+    parser.add_argument('-s', '--similar', action='store_true', help="link near-identical articles and Absätze across the batch and write a <name>.similar.ttl per act")
+    parser.add_argument('-m', '--metrics', default=None, help="time collector calls in the workers and export the merged timings to this JSON file")
+    args = parser.parse_args()
+    metrics = Metrics() if args.metrics else None
+    report = run(pdf_files(args.sources), args.out, args.workers, metrics)
+    if metrics is not None:
+        metrics.export(args.metrics)
+    if args.references:
+        write_references([r['json'] for r in report['results'] if not r['error']])
+    if args.similar:
+        write_similarities([r['json'] for r in report['results'] if not r['error']])
+    if args.corpus is not None:
+        add_to_corpus(report, args.corpus)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=4)
+    print("{} files, {} failed, {:.2f}s wall, {:.2f}s in workers".format(report['files'], report['failed'], report['seconds'], report['cpu_seconds']))
+    sys.exit(1 if report['failed'] else 0)
@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tempfile
+import tracemalloc
+from rdflib import Graph
+from collector import Collector, Frame, Text
+from recogniser import recognise
+from synthetic import generate
+from validation import IncrementalValidator
+
+
+def build_graph_sparql(sequence:list[Frame]) -> Graph:
+    graph = Graph()
+    prefix  = "PREFIX : <http://example.org/> "
+    prefix += "PREFIX sl: <https://raw.githubusercontent.com/mathiasrichter/semanticlaw/main/swisslaw.ttl#> "
+    for f in sequence:
+        query = prefix + "INSERT DATA { "
+        query += ":" + f.id + " a sl:" + f.type + " . "
+        if f.parent is not None:
+            query += ":" + f.id + " sl:parent :" + f.parent + " . "
+        if f.prev is not None:
+            query += ":" + f.id + " sl:prev :" + f.prev + " . "
+        if f.next is not None:
+            query += ":" + f.id + " sl:next :" + f.next + " . "
+        if f.title is not None:
+            query += ":" + f.id + ' sl:title """' + f.title + '"""@de . '
+        if f.content is not None:
+            query += ":" + f.id + ' sl:content """' + f.content + '"""@de . '
+        if f.ord is not None:
+            if type(f.ord) == int:
+                query += ":" + f.id + " sl:ord " + str(f.ord) + " . "
+            else:
+                query += ":" + f.id + ' sl:ord "' + f.ord + '" . '
+        query += "}"
+        graph.update(query)
+    return graph
+
+
+def save_via_graph(collector:Collector, file_name:str):
+    with open(file_name, "w") as f:
+        f.writelines(collector.build_graph().serialize(format='ttl'))
+
+
+class DictFrame:
+
+    def __init__(self, id:str, line_no:int = None, type:str = None, parent:str = None, prev:str = None, next:str = None, ord = None, title:str = None, content:str = None):
+        self.id = id
+        self.line_no = line_no
+        self.type = type
+        self.parent = parent
+        self.prev = prev
+        self.next = next
+        self.ord = ord
+        self.title = title
+        self.content = content
+
+
+class Benchmarks:
+
+    CALLS = 10000
+
+    def __init__(self, collector:Collector, lines:list[str], directory:str, seed:int = 0):
+        self.collector = collector
+        self.lines = lines
+        self.directory = directory
+        self.random = random.Random(seed)
+
+    def names(self) -> list[str]:
+        return [name[6:] for name in dir(self) if name.startswith('bench_')]
+
+    def path(self, name:str) -> str:
+        return os.path.join(self.directory, name)
+
+    def bench_build_graph(self):
+        return lambda: {'triples': len(self.collector.build_graph())}
+
+    def bench_build_graph_sparql(self):
+        sequence = [Frame(**f.serialize()) for f in self.collector.sequence]
+        # the SPARQL builder cannot parse titles containing """
+        for f in sequence:
+            if f.title is not None:
+                f.title = f.title.replace('"""', '')
+        return lambda: {'triples': len(build_graph_sparql(sequence))}
+
+    def save(self, name:str):
+        file_name = self.path(name)
+        def run():
+            self.collector.save(file_name)
+            return {'bytes': os.path.getsize(file_name)}
+        return run
+
+    def bench_save_ttl(self):
+        return self.save('synthetic.ttl')
+
+    def bench_save_nt_gz(self):
+        return self.save('synthetic.nt.gz')
+
+    def bench_save_graph_serialize(self):
+        file_name = self.path('graph.ttl')
+        def run():
+            save_via_graph(self.collector, file_name)
+            return {'bytes': os.path.getsize(file_name)}
+        return run
+
+    def bench_serialize(self):
+        file_name = self.path('synthetic.json')
+        def run():
+            self.collector.serialize(file_name)
+            return {'bytes': os.path.getsize(file_name)}
+        return run
+
+    def bench_deserialize(self):
+        file_name = self.path('synthetic.json')
+        self.collector.serialize(file_name)
+        return lambda: self.collector.deserialize(file_name)
+
+    def bench_serialize_binary(self):
+        file_name = self.path('synthetic.state')
+        def run():
+            self.collector.serialize(file_name)
+            return {'bytes': os.path.getsize(file_name)}
+        return run
+
+    def bench_deserialize_binary(self):
+        file_name = self.path('synthetic.state')
+        self.collector.serialize(file_name)
+        collector = Collector('synthetic.pdf', Text.from_lines(self.lines))
+        return lambda: collector.deserialize(file_name)
+
+    def bench_deserialize_binary_full(self):
+        file_name = self.path('synthetic.state')
+        self.collector.serialize(file_name)
+        collector = Collector('synthetic.pdf', Text.from_lines(self.lines))
+        def run():
+            collector.deserialize(file_name)
+            for f in collector.sequence:
+                f.title, f.content
+        return run
+
+    def sample(self, types:list[str]) -> list[tuple]:
+        frames = [f for f in self.collector.sequence if f.type in types]
+        return [(f.type, f.parent) for f in self.random.choices(frames, k=self.CALLS)] if frames else []
+
+    def bench_get_next_int_ord(self):
+        calls = self.sample([Collector.ABSCH, Collector.ART, Collector.ABS])
+        def run():
+            for type, parent in calls:
+                self.collector.get_next_int_ord(type, parent)
+            return {'calls': len(calls)}
+        return run
+
+    def bench_get_next_char_ord(self):
+        calls = self.sample([Collector.LIT])
+        def run():
+            for type, parent in calls:
+                self.collector.get_next_char_ord(type, parent)
+            return {'calls': len(calls)}
+        return run
+
+    def bench_char_ord_sort(self):
+        literae = [f for f in self.collector.sequence if f.type == Collector.LIT]
+        self.random.shuffle(literae)
+        return lambda: {'items': len(Collector.CHAR_ORD.sort(literae))}
+
+    def bench_validate_full(self):
+        validator = IncrementalValidator(self.collector)
+        validator.sync()
+        def run():
+            conforms, text = validator.validate(full=True)
+            return {'conforms': conforms}
+        return run
+
+    def bench_validate_incremental(self):
+        validator = IncrementalValidator(self.collector)
+        validator.validate()
+        frames = [f for f in self.collector.sequence if f.type == Collector.ABS]
+        def run():
+            self.collector.changed(self.random.choice(frames))
+            conforms, text = validator.validate()
+            return {'conforms': conforms}
+        return run
+
+    def bench_recognise(self):
+        def run():
+            collector = Collector('synthetic.pdf', Text.from_lines(self.lines))
+            doubts = recognise(collector)
+            return {'frames': collector.length(), 'doubts': len(doubts)}
+        return run
+
+    def bench_frame_memory(self):
+        sequence = self.collector.sequence
+        def run():
+            result = {}
+            for label, clazz in [('dict', DictFrame), ('slots', Frame)]:
+                tracemalloc.start()
+                frames = [clazz(f.id, f.line_no, f.type, f.parent, f.prev, f.next, f.ord, f.title, f.content) for f in sequence]
+                result[label + '_bytes_per_frame'] = tracemalloc.get_traced_memory()[0] / len(frames)
+                tracemalloc.stop()
+                del frames
+            return result
+        return run
+
+
+DEFAULT_SKIP = ['build_graph_sparql', 'save_graph_serialize']
+
+
+def measure(run, repeat:int, memory:bool = False) -> dict:
+    times = []
+    extra = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        extra = run()
+        times.append(time.perf_counter() - start)
+    result = {'min': min(times), 'median': statistics.median(times), 'max': max(times), 'times': times}
+    if memory:
+        tracemalloc.start()
+        run()
+        if tracemalloc.is_tracing():
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    if extra:
+        result.update(extra)
+    return result
+
+
+def revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(sizes:list[int], names:list[str] = None, skip:list[str] = DEFAULT_SKIP, repeat:int = 3, seed:int = 0, memory:bool = False) -> dict:
+    report = {
+        'revision': revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seed': seed,
+        'repeat': repeat,
+        'results': []
+    }
+    for size in sizes:
+        start = time.perf_counter()
+        state, lines = generate(size, seed)
+        collector = Collector('synthetic.pdf', Text.from_lines(lines))
+        collector.load_state(state)
+        del state
+        print("{:<24} {:>8} frames {:>10.3f}s {:>8} lines".format('generate', size, time.perf_counter() - start, len(lines)))
+        with tempfile.TemporaryDirectory() as d:
+            benchmarks = Benchmarks(collector, lines, d, seed)
+            for name in names if names else [n for n in benchmarks.names() if n not in skip]:
+                result = measure(getattr(benchmarks, 'bench_' + name)(), repeat, memory)
+                result['benchmark'] = name
+                result['frames'] = size
+                report['results'].append(result)
+                line = "{:<24} {:>8} frames {:>10.4f}s min {:>10.4f}s median".format(name, size, result['min'], result['median'])
+                if 'peak_bytes' in result:
+                    line += " {:>10.1f} MiB peak".format(result['peak_bytes'] / 2**20)
+                print(line)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the collector on synthetic Swiss law texts.")
+    parser.add_argument('frames', type=int, nargs='*', default=[5000], help="document sizes in frames (default: 5000)")
+    parser.add_argument('-b', '--bench', action='append', default=None, help="run only this benchmark (repeatable)")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="seed for the synthetic text")
+    parser.add_argument('-m', '--memory', action='store_true', help="also record peak memory in an extra traced run")
+    parser.add_argument('-o', '--out', default=None, help="write the results as JSON to this file")
+    parser.add_argument('-l', '--list', action='store_true', help="list the available benchmarks")
+    args = parser.parse_args()
+    if args.list:
+        for name in Benchmarks(None, None, None).names():
+            print(name + (' (not run by default)' if name in DEFAULT_SKIP else ''))
+        sys.exit(0)
+    report = run(args.frames, args.bench, repeat=args.repeat, seed=args.seed, memory=args.memory)
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=4)
@@ -1,15 +1,34 @@
-from rdflib import Graph
-from pyshacl import validate
+from rdflib import Graph, Namespace, Literal, RDF
 import os
 import re
 import sys
+import argparse
 from erdi8 import Erdi8
 import cmd2
-from pdfminer.high_level import extract_text
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdftypes import resolve1
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from collections import OrderedDict
+from bisect import bisect_right
+from io import StringIO
+from textcache import TextCache
 from functools import cmp_to_key
 import json
+import threading
+from rdfwriter import NTriplesWriter, TurtleWriter, open_output, format_for
+from instrumentation import Instrumentation
+
+SL = Namespace("https://raw.githubusercontent.com/mathiasrichter/semanticlaw/main/swisslaw.ttl#")
+EX = Namespace("http://example.org/")
 
 class Frame:
+    
+    __slots__ = ('id', 'line_no', 'type', 'parent', 'prev', 'next', 'ord', 'title', 'content')
+    
     def __init__(
         self,
         id: str,
@@ -72,8 +91,11 @@ class SequenceEmptyError(Exception):
 
 class SequencedStack:
     
-    hierarchy = []
-    sequence = []
+    def __init__(self):
+        self.hierarchy = []
+        self.sequence = []
+        self.frames = {}
+        self.children = {}
 
     def append(self, frame:Frame):
         if self.length() > 0:
@@ -81,6 +103,29 @@ class SequencedStack:
             frame.prev = prev.id
             prev.next = frame.id
         self.sequence.append(frame)
+        self.index(frame)
+        
+    def index(self, frame:Frame):
+        self.frames[frame.id] = frame
+        self.children.setdefault(frame.parent, []).append(frame)
+        
+    def unindex(self, frame:Frame):
+        self.frames.pop(frame.id, None)
+        siblings = self.children.get(frame.parent)
+        if siblings and siblings[-1] is frame:
+            siblings.pop()
+            
+    def reindex(self):
+        self.frames = {}
+        self.children = {}
+        for f in self.sequence:
+            self.index(f)
+            
+    def get(self, id:str) -> Frame:
+        return self.frames.get(id)
+    
+    def get_children(self, id:str) -> list[Frame]:
+        return self.children.get(id, [])
 
     def last(self):
         if self.length() == 0:
@@ -96,11 +141,11 @@ class SequencedStack:
     def remove_top(self):
         if self.depth() > 0:
             self.hierarchy.pop()
-            self.sequence.pop()
+            self.unindex(self.sequence.pop())
     
     def remove_last(self):
         if self.length() > 0:
-            self.sequence.pop()
+            self.unindex(self.sequence.pop())
     
     def pop(self) -> Frame:
         if self.depth() > 0:
@@ -159,28 +204,256 @@ class TypeError(Exception):
 
 class Text:
 
-    text = None
+    WINDOW = 16
+    CHUNK = 4096
+    BLANK = re.compile(r'\s*$')
     
     line_no = 0
     
-    def __init__(self, pdf_filename:str):
-        self.text = extract_text(pdf_filename, 'rb').split('\n')
+    def __init__(self, pdf_filename:str, window:int = WINDOW, laparams:LAParams = None, cache:TextCache = None, refresh:bool = False, background:bool = False):
+        self.pdf_filename = pdf_filename
+        self.window = window
+        self.laparams = laparams if laparams is not None else LAParams()
+        self.pages = OrderedDict()
+        self.current = 0
+        self.offsets = []
+        self.carries = []
+        self.count = 0
+        self.carry = ''
+        self.complete = False
+        self.source = None
+        self.cached = None
+        self.cache_writer = None
+        self.blank = bytearray()
+        self.lock = threading.Condition(threading.RLock())
+        self.thread = None
+        self.error = None
+        self.stopping = False
+        self.page_count = None
+        if pdf_filename is None:
+            return
+        if cache is not None:
+            key = cache.key(pdf_filename, self.laparams)
+            if not refresh:
+                self.cached = cache.get(key)
+            if self.cached is not None:
+                self.count = len(self.cached)
+                self.complete = True
+                return
+            self.cache_writer = cache.writer(key)
+        self.source = self.extract_pages()
+        if background:
+            self.thread = threading.Thread(target=self.extract, name='extract ' + os.path.basename(pdf_filename), daemon=True)
+            self.thread.start()
+        
+    @classmethod
+    def from_lines(cls, lines:list[str]):
+        t = cls(None)
+        t.add_lines(list(lines[0:-1]), lines[-1] if len(lines) > 0 else '')
+        t.finish()
+        return t
+    
+    def extract_pages(self, pages:range = None):
+        output = StringIO()
+        manager = PDFResourceManager(caching=True)
+        device = TextConverter(manager, output, laparams=self.laparams)
+        interpreter = PDFPageInterpreter(manager, device)
+        with open(self.pdf_filename, 'rb') as fp:
+            document = PDFDocument(PDFParser(fp))
+            if pages is None:
+                self.page_count = resolve1(document.catalog['Pages']).get('Count')
+            for i, page in enumerate(PDFPage.create_pages(document)):
+                if pages is not None and i not in pages:
+                    if i >= pages.stop:
+                        break
+                    continue
+                interpreter.process_page(page)
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+        device.close()
+        
+    def split_page(self, carry:str, page_text:str):
+        segments = page_text.split('\n')
+        segments[0] = carry + segments[0]
+        return segments[0:-1], segments[-1]
+    
+    def add_lines(self, lines:list[str], carry:str, ahead:bool = False):
+        if self.cache_writer is not None:
+            self.cache_writer.add(lines)
+        # count goes last: readers check it without taking the lock
+        self.blank.extend(self.BLANK.match(line) is not None for line in lines)
+        self.offsets.append(self.count)
+        self.carries.append(self.carry)
+        self.carry = carry
+        self.cache(len(self.offsets) - 1, lines, ahead)
+        self.count += len(lines)
+        
+    def finish(self):
+        self.add_lines([self.carry], None)
+        self.complete = True
+        self.source = None
+        if self.cache_writer is not None:
+            self.cache_writer.commit()
+            self.cache_writer = None
+        
+    def extract(self):
+        try:
+            while not self.stopping and not self.complete:
+                page_text = next(self.source, None)
+                with self.lock:
+                    if page_text is None:
+                        self.finish()
+                    else:
+                        self.add_lines(*self.split_page(self.carry, page_text), True)
+                    self.lock.notify_all()
+        except Exception as e:
+            with self.lock:
+                self.error = e
+                self.lock.notify_all()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stopping = True
+            self.thread.join()
+            self.thread = None
+        if not self.complete and self.cache_writer is not None:
+            self.cache_writer.abort()
+            self.cache_writer = None
+
+    def progress(self) -> str:
+        if self.complete:
+            return ''
+        return '+ page ' + str(len(self.offsets)) + ('/' + str(self.page_count) if self.page_count else '')
+
+    def fetch(self) -> bool:
+        if self.thread is not None:
+            with self.lock:
+                count = self.count
+                self.lock.wait_for(lambda: self.count != count or self.complete or self.error is not None)
+                if self.error is not None:
+                    raise self.error
+                return self.count != count
+        if self.complete:
+            return False
+        page_text = next(self.source, None)
+        if page_text is None:
+            self.finish()
+        else:
+            self.add_lines(*self.split_page(self.carry, page_text))
+        return True
+    
+    def cache(self, page:int, lines:list[str], ahead:bool = False):
+        # pages extracted ahead of the reader never evict the pages around the one being read
+        if ahead and len(self.pages) >= self.window:
+            victim = next((p for p in self.pages if abs(p - self.current) > self.window // 2), None)
+            if victim is None:
+                return
+            del self.pages[victim]
+        self.pages[page] = lines
+        self.pages.move_to_end(page)
+        while len(self.pages) > self.window:
+            self.pages.popitem(last=False)
+            
+    def page(self, page:int) -> list[str]:
+        with self.lock:
+            self.current = page
+            lines = self.pages.get(page)
+            carry = self.carries[page]
+            last = page == len(self.offsets) - 1 and self.complete
+            end = min(page + max(1, self.window // 2), len(self.offsets) - (1 if self.complete else 0))
+            carries = self.carries[page:end]
+        if lines is None:
+            if last:
+                lines = [carry]
+            else:
+                # evicted pages are re-extracted in runs, one parse of the document per run,
+                # without holding up the extraction thread
+                run = [self.split_page(c, t)[0] for c, t in zip(carries, self.extract_pages(range(page, end)))]
+                lines = run[0]
+                with self.lock:
+                    for p in range(end - 1, page, -1):
+                        self.cache(p, run[p - page])
+        with self.lock:
+            self.cache(page, lines)
+        return lines
+        
+    def has_line(self, line_no:int) -> bool:
+        while line_no >= self.count and self.fetch():
+            pass
+        return 0 <= line_no < self.count
+    
+    def line(self, line_no:int) -> str:
+        if not self.has_line(line_no):
+            raise IndexError("line {} is beyond the end of the text".format(line_no))
+        if self.cached is not None:
+            return self.cached[line_no]
+        with self.lock:
+            page = bisect_right(self.offsets, line_no) - 1
+            offset = self.offsets[page]
+        return self.page(page)[line_no - offset]
+    
+    def length(self) -> int:
+        return self.count
+
+    def index_to(self, line_no:int) -> bool:
+        if not self.has_line(line_no):
+            return False
+        if self.cached is not None and len(self.blank) <= line_no:
+            end = min(self.count, max(line_no + 1, len(self.blank) + self.CHUNK))
+            self.blank.extend(self.BLANK.match(self.cached[i]) is not None for i in range(len(self.blank), end))
+        return True
+
+    def is_blank(self, line_no:int) -> bool:
+        if not self.index_to(line_no):
+            raise IndexError("line {} is beyond the end of the text".format(line_no))
+        return self.blank[line_no] == 1
+
+    def find_line(self, blank:bool, start:int) -> int:
+        i = max(start, 0)
+        while self.index_to(i):
+            # the extraction thread may append lines during the search
+            n = len(self.blank)
+            found = self.blank.find(1 if blank else 0, i, n)
+            if found >= 0:
+                return found
+            i = n
+        return None
+
+    def search(self, pattern:re.Pattern, start:int) -> int:
+        i = self.find_line(False, start)
+        while i is not None:
+            if pattern.search(self.line(i)) is not None:
+                return i
+            i = self.find_line(False, i + 1)
+        return None
+
+    def skip_blocks(self, count:int, start:int) -> int:
+        i = start
+        for n in range(count):
+            end = self.find_line(True, i)
+            i = self.find_line(False, end) if end is not None else None
+            if i is None:
+                return None
+        return i
         
     def next(self):
         self.line_no += 1
         
     def get_line(self):
-        return self.text[self.line_no]
+        return self.line(self.line_no)
         
     def get_lines(self, start:int, end:int):
         if start == end:
-            return "".join(self.text[start])
-        return self.text[start:end]
+            return "".join(self.line(start))
+        return [self.line(i) for i in range(start, end) if self.has_line(i)]
 
 class CharacterOrdinal:
     
+    VALID = re.compile('[a-z]+$')
+    
     def is_valid(self, value:str):
-        match = ( re.match('^[a-z]+$', value) is not None )
+        match = ( self.VALID.match(value) is not None )
         if not match:
             return False
         for i in range(0, len(value)-1):
@@ -221,6 +494,51 @@ class CharacterOrdinal:
         return sorted(items, key=cmp_to_key(self.compare))
         
 
+class OrdinalIndex:
+    
+    def __init__(self, global_types:list[str], char_ord:CharacterOrdinal):
+        self.global_types = global_types
+        self.char_ord = char_ord
+        self.ints = {}
+        self.chars = {}
+        
+    def key(self, f:Frame, numeric:bool):
+        if numeric and f.type in self.global_types:
+            return (f.type, None)
+        return (f.type, f.parent)
+    
+    def add(self, f:Frame):
+        if type(f.ord) == int:
+            maxima = self.ints.setdefault(self.key(f, True), [])
+            value = f.ord if len(maxima) == 0 or f.ord > maxima[-1][1] else maxima[-1][1]
+            maxima.append((f.id, value))
+        elif type(f.ord) == str and self.char_ord.is_valid(f.ord.lower()):
+            maxima = self.chars.setdefault(self.key(f, False), [])
+            value = self.char_ord.num_ord(f.ord.lower())
+            if len(maxima) == 0 or value > maxima[-1][1]:
+                maxima.append((f.id, value, f.ord.lower()))
+            else:
+                maxima.append((f.id,) + maxima[-1][1:])
+                
+    def remove(self, f:Frame):
+        for index, numeric in [(self.ints, True), (self.chars, False)]:
+            maxima = index.get(self.key(f, numeric))
+            if maxima and maxima[-1][0] == f.id:
+                maxima.pop()
+                
+    def clear(self):
+        self.ints = {}
+        self.chars = {}
+        
+    def max_int(self, clazz:str, parent:str) -> int:
+        maxima = self.ints.get((clazz, None) if clazz in self.global_types else (clazz, parent))
+        return maxima[-1][1] if maxima else None
+    
+    def max_char(self, clazz:str, parent:str) -> str:
+        maxima = self.chars.get((clazz, parent))
+        return maxima[-1][2] if maxima else None
+
+
 class Collector(SequencedStack):
     
     BG = "Bundesgesetz"
@@ -242,6 +560,9 @@ class Collector(SequencedStack):
     CHAR_ORD = CharacterOrdinal()
     ID = Erdi8()
     
+    ordinals = None
+    observers = None
+    
     last_id = None
     text = None    
     cur_mode = None
@@ -249,9 +570,12 @@ class Collector(SequencedStack):
     
     file_name = None
     
-    def __init__(self, filename:str):
+    def __init__(self, filename:str, text:Text = None):
+        super().__init__()
+        self.observers = []
         self.file_name = filename[0:filename.rfind('.')]
-        self.text = Text(filename)
+        self.text = text if text is not None else Text(filename)
+        self.ordinals = OrdinalIndex([self.ART, self.PAR], self.CHAR_ORD)
         start = filename.lower()
         orig = filename.lower()
         for i in range(0,len(orig)):
@@ -259,16 +583,14 @@ class Collector(SequencedStack):
                 start = start.replace(orig[i], "")
         self.last_id = self.ID.increment(start)
         
-    def serialize(self, file_name:str = None):
-        if file_name is None or file_name == '':
-            file_name = self.file_name + ".json"
+    def state(self) -> dict:
         s = []
         for f in self.sequence:
             s.append(f.serialize())
         h = []
         for f in self.hierarchy:
             h.append(f.id)
-        state = {
+        return {
             'last_id': self.last_id,
             'sequence': s,
             'hierarchy': h,
@@ -276,25 +598,77 @@ class Collector(SequencedStack):
             'cur_mode': self.cur_mode,
             'cur_start': self.cur_start
         }
+    
+    def load_state(self, state:dict):
+        self.restore([Frame.deserialize(d) for d in state['sequence']], state)
+
+    def restore(self, sequence:list[Frame], state:dict):
+        self.last_id = state['last_id']
+        self.sequence = sequence
+        self.reindex()
+        self.hierarchy = [self.frames[d] for d in state['hierarchy']]
+        self.text.line_no = state['text_line_no']
+        self.cur_mode = state['cur_mode']
+        self.cur_start = state['cur_start']
+        for o in self.observers:
+            o.state_loaded()
+        
+    def serialize(self, file_name:str = None):
+        if file_name is None or file_name == '':
+            file_name = self.file_name + ".json"
+        if file_name.endswith('.state'):
+            from statefile import write_state
+            write_state(file_name, self.state())
+            return
         with open(file_name, 'w') as f:
-            json.dump(state, f, indent=4)
+            json.dump(self.state(), f, indent=4)
         
     def deserialize(self, file_name:str):
+        if file_name.endswith('.state'):
+            from statefile import BinaryState
+            binary = BinaryState(file_name)
+            self.restore(binary.frames(), binary.state([]))
+            return
         with open(file_name, 'r') as f:
-            state = json.load(f)
-            self.last_id = state['last_id']
-            self.sequence= []
-            lookup = {}
-            for d in state['sequence']:
-                f = Frame.deserialize(d)
-                self.sequence.append(f)
-                lookup[f.id] = f
-            self.hierarchy = []
-            for d in state['hierarchy']:
-                self.hierarchy.append(lookup[d])
-            self.text.line_no = state['text_line_no']
-            self.cur_mode = state['cur_mode']
-            self.cur_start = state['cur_start']
+            self.load_state(json.load(f))
+            
+    def add_observer(self, observer):
+        self.observers.append(observer)
+        
+    def changed(self, f:Frame):
+        if f is not None:
+            for o in self.observers:
+                o.frame_changed(f)
+                
+    def removed(self, f:Frame):
+        for o in self.observers:
+            o.frame_removed(f)
+            
+    def append(self, frame:Frame):
+        prev = self.last() if self.length() > 0 else None
+        super().append(frame)
+        self.changed(frame)
+        self.changed(prev)
+            
+    def reindex(self):
+        super().reindex()
+        self.ordinals.clear()
+        for f in self.sequence:
+            self.ordinals.add(f)
+            
+    def remove_top(self):
+        if self.depth() > 0:
+            f = self.top()
+            self.ordinals.remove(f)
+            super().remove_top()
+            self.removed(f)
+        
+    def remove_last(self):
+        if self.length() > 0:
+            f = self.last()
+            self.ordinals.remove(f)
+            super().remove_last()
+            self.removed(f)
 
     def cancel(self):
         if self.last() is not None and self.top() is not None and self.last() == self.top():
@@ -305,50 +679,66 @@ class Collector(SequencedStack):
             self.remove_last()
             if self.last() is not None:
                 self.last().next = None
+        self.changed(self.top())
+        self.changed(self.last())
         self.text.line_no = self.last().line_no if self.last() is not None else 0
         self.cur_mode = None
         self.cur_start = None
         
     def is_empty_line(self)->bool:
-        return ( re.match('^(\s)+$', self.get_line()) is not None ) or self.get_line() == ''
+        return self.text.is_blank(self.text.line_no)
     
     def next_line(self):
-        self.text.next()
-        if self.is_empty_line():
-            self.next_line()
+        i = self.text.find_line(False, self.text.line_no + 1)
+        self.text.line_no = i if i is not None else max(self.text.line_no, self.text.length() - 1)
             
     def next_block(self) -> str:
-        self.text.next()
-        block = self.get_line()
-        while self.is_empty_line() is False :
-            self.text.next()
-            block += '\n' + self.get_line()
-        if self.is_empty_line():
-            self.next_line()
+        start = self.text.line_no + 1
+        if not self.text.has_line(start):
+            return ''
+        end = self.text.find_line(True, start)
+        end = end if end is not None else self.text.length() - 1
+        block = "\n".join(self.text.get_lines(start, end + 1))
+        self.text.line_no = end
+        self.next_line()
         return block
+
+    def goto_line(self, line_no:int):
+        if not self.text.has_line(line_no):
+            raise IndexError("line {} is beyond the end of the text".format(line_no))
+        self.text.line_no = line_no
+
+    def find_line(self, pattern:str) -> int:
+        try:
+            regex = re.compile(pattern)
+        except re.error:
+            regex = re.compile(re.escape(pattern))
+        i = self.text.search(regex, self.text.line_no + 1)
+        if i is not None:
+            self.text.line_no = i
+        return i
+
+    def skip_blocks(self, count:int) -> int:
+        i = self.text.skip_blocks(count, self.text.line_no)
+        if i is not None:
+            self.text.line_no = i
+        return i
         
     def get_line(self):
         return self.text.get_line()
         
     def get_next_int_ord(self, clazz :str, parent :str) -> int:
-        siblings = []
-        if clazz in [self.ART, self.PAR]:
-            siblings = list(filter(lambda f: True if f.type==clazz and f.ord is not None and type(f.ord) == int else False, self.sequence))
-        else:
-            siblings = list(filter(lambda f: True if f.type==clazz and f.parent==parent and f.ord is not None and type(f.ord) == int else False, self.sequence))
-        siblings.sort(key=lambda x: x.ord)
-        if len(siblings) > 0:
-            return siblings[-1].ord + 1
-        else:
-            return 1
+        current = self.ordinals.max_int(clazz, parent)
+        return current + 1 if current is not None else 1
         
     def get_next_char_ord(self, clazz :str, parent :str) -> int:
-        siblings = list(filter(lambda f: f.type==clazz and f.parent==parent and f.ord is not None and type(f.ord) == str, self.sequence))
-        siblings = self.CHAR_ORD.sort(siblings)
-        if len(siblings) > 0:
-            return self.CHAR_ORD.next(siblings[-1].ord.lower())
-        else:
-            return 'a'
+        current = self.ordinals.max_char(clazz, parent)
+        return self.CHAR_ORD.next(current) if current is not None else 'a'
+        
+    def set_ord(self, f:Frame, ord):
+        f.ord = ord
+        self.ordinals.add(f)
+        self.changed(f)
         
     def is_collecting(self):
         return ( self.cur_start is not None and self.cur_mode is not None)
@@ -398,14 +788,14 @@ class Collector(SequencedStack):
             raise StructureError("Cannot open abschnitt scope in {}".format(self.top().type))
         f = Frame(self.new_id(), line_no=self.text.line_no, type=self.ABSCH)
         self.push(f)
-        f.ord = self.get_next_int_ord(self.ABSCH, f.parent)
+        self.set_ord(f, self.get_next_int_ord(self.ABSCH, f.parent))
         
     def new_char_abschnitt(self):
         if self.top() and self.top().type in [self.TITLE, self.CONT, self.ART, self.PAR, self.ABS, self.LIT]:
             raise StructureError("Cannot open abschnitt scope in {}".format(self.top().type))
         f = Frame(self.new_id(), line_no=self.text.line_no, type=self.ABSCH)
         self.push(f)
-        f.ord = self.get_next_char_ord(self.ABSCH, f.parent).upper()
+        self.set_ord(f, self.get_next_char_ord(self.ABSCH, f.parent).upper())
         
     def new_article(self, ord:str = None):
         if self.top() and self.top().type in [self.TITLE, self.CONT, self.ART, self.PAR, self.ABS, self.LIT]:
@@ -413,9 +803,9 @@ class Collector(SequencedStack):
         f = Frame(self.new_id(), line_no=self.text.line_no, type=self.ART)
         self.push(f)
         if ord is not None:
-            f.ord = ord
+            self.set_ord(f, ord)
         else:
-            f.ord = self.get_next_int_ord(self.ART, f.parent)
+            self.set_ord(f, self.get_next_int_ord(self.ART, f.parent))
         
     def new_paragraph(self, ord:str = None):
         if self.top() and self.top().type in [self.TITLE, self.CONT, self.ART, self.PAR, self.ABS, self.LIT]:
@@ -423,23 +813,68 @@ class Collector(SequencedStack):
         f = Frame(self.new_id(), line_no=self.text.line_no, type=self.PAR)
         self.push(f)
         if ord is not None:
-            f.ord = ord
+            self.set_ord(f, ord)
         else:
-            f.ord = self.get_next_int_ord(self.PAR, f.parent)
+            self.set_ord(f, self.get_next_int_ord(self.PAR, f.parent))
 
-    def new_absatz(self):
+    def new_absatz(self, ord:str = None):
         if self.top() and self.top().type in [self.TITLE, self.CONT, self.ABS, self.LIT, self.BG, self.BV, self.KG, self.KV, self.KVO]:
             raise StructureError("Cannot open absatz scope in {}".format(self.top().type))
         f = Frame(self.new_id(), line_no=self.text.line_no, type=self.ABS)
         self.push(f)
-        f.ord = self.get_next_int_ord(self.ABS, f.parent)
+        if ord is not None:
+            self.set_ord(f, ord)
+        else:
+            self.set_ord(f, self.get_next_int_ord(self.ABS, f.parent))
 
-    def new_litera(self):
+    def new_litera(self, ord:str = None):
         if self.top() and self.top().type in [self.TITLE, self.CONT, self.BG, self.BV, self.KG, self.KV, self.KVO]:
             raise StructureError("Cannot open litera scope in {}".format(self.top().type))
         f = Frame(self.new_id(), line_no=self.text.line_no, type=self.LIT)
         self.push(f)
-        f.ord = self.get_next_char_ord(self.LIT, f.parent)
+        if ord is not None:
+            self.set_ord(f, ord)
+        else:
+            self.set_ord(f, self.get_next_char_ord(self.LIT, f.parent))
+
+    def new(self, line:str) -> bool:
+        match = re.search("(\w+)(( )(\w+)){0,1}$", line)
+        type = ""
+        set_char_ord = None
+        if match is not None:
+            type = match.group(1).lower()
+            set_char_ord = match.group(4)
+        if type in [self.BG.lower(), self.BV.lower(), self.KG.lower(), self.KV.lower(), self.KVO.lower()]:
+            self.new_document(line)
+        elif self.ABSCH.lower().startswith(type):
+            if set_char_ord is not None:
+                self.new_char_abschnitt()
+            else:
+                self.new_int_abschnitt()
+        elif self.ABS.lower().startswith(type):
+            self.new_absatz()
+        elif self.PAR.lower().startswith(type):
+            if set_char_ord:
+                self.new_paragraph(set_char_ord)
+            else:
+                self.new_paragraph()
+        elif self.ART.lower().startswith(type):
+            if set_char_ord:
+                self.new_article(set_char_ord)
+            else:
+                self.new_article()
+        elif self.LIT.lower().startswith(type):
+            self.new_litera()
+            self.new_content()
+        else:
+            return False
+        return True
+
+    def end_scope(self):
+        # a Litera collects its content implicitly, so one end closes both
+        if self.last().type in [self.LIT] and self.is_collecting():
+            self.end()
+        self.end()
 
     def end(self):
         cur = self.top()
@@ -450,96 +885,116 @@ class Collector(SequencedStack):
                 cur.content = self.end_collect()
             else:
                 raise StructureError("Unknown collection mode.")
+            self.changed(cur)
         else:
             self.pop()
             
+    def frame_triples(self, f:Frame):
+        s = EX[f.id]
+        yield (s, RDF.type, SL[f.type])
+        if f.parent is not None:
+            yield (s, SL.parent, EX[f.parent])
+        if f.prev is not None:
+            yield (s, SL.prev, EX[f.prev])
+        if f.next is not None:
+            yield (s, SL.next, EX[f.next])
+        if f.title is not None:
+            yield (s, SL.title, Literal(f.title, lang='de'))
+        if f.content is not None:
+            yield (s, SL.content, Literal(f.content, lang='de'))
+        if f.ord is not None:
+            yield (s, SL.ord, Literal(f.ord))
+
+    def triples(self):
+        for f in self.sequence:
+            yield from self.frame_triples(f)
+
     def build_graph(self) -> Graph:
         graph = Graph()
-        prefix  = "PREFIX : <http://example.org/> "
-        prefix += "PREFIX sl: <https://raw.githubusercontent.com/mathiasrichter/semanticlaw/main/swisslaw.ttl#> "
-        for f in self.sequence:
-            query = prefix + "INSERT DATA { "
-            query += ":" + f.id + " a sl:" + f.type + " . "
-            if f.parent is not None:
-                query += ":" + f.id + " sl:parent :" + f.parent + " . "
-            if f.prev is not None:
-                query += ":" + f.id + " sl:prev :" + f.prev + " . "
-            if f.next is not None:
-                query += ":" + f.id + " sl:next :" + f.next + " . "
-            if f.title is not None:
-                query += ":" + f.id + ' sl:title """' + f.title + '"""@de . '
-            if f.content is not None:
-                query += ":" + f.id + ' sl:content """' + f.content + '"""@de . '
-            if f.ord is not None:
-                if type(f.ord) == int:
-                    query += ":" + f.id + " sl:ord " + str(f.ord) + " . "
-                else:
-                    query += ":" + f.id + ' sl:ord "' + f.ord + '" . '
-            query += "}"
-            graph.update(query)
+        graph.bind('sl', SL)
+        graph.addN((s, p, o, graph) for s, p, o in self.triples())
         return graph
         
         
-    def save(self, file_name:str):
-        with open(file_name, "w") as f:
-            f.writelines(self.build_graph().serialize(format='ttl'))
+    def write(self, out, format:str = 'ttl'):
+        if format == 'nt':
+            writer = NTriplesWriter(out)
+        else:
+            writer = TurtleWriter(out, {'': str(EX), 'sl': str(SL)})
+        writer.write(self.triples())
+
+    def save(self, file_name:str, format:str = None, compress:bool = None):
+        if format is None:
+            format = format_for(file_name)
+        with open_output(file_name, compress) as f:
+            self.write(f, format)
+
+    def written(self, default:str = None):
+        def size(args, kwargs, result):
+            file_name = (args[0] if args else kwargs.get('file_name')) or default
+            return os.path.getsize(file_name) if os.path.exists(file_name) else 0
+        return size
+
+    COMMANDS = ['new', 'new_document', 'new_title', 'new_content', 'end', 'end_scope', 'cancel', 'next_line', 'next_block',
+                'goto_line', 'find_line', 'skip_blocks', 'get_next_int_ord', 'get_next_char_ord', 'serialize', 'deserialize',
+                'save', 'write', 'build_graph', 'triples']
+
+    def instrument(self, instrumentation:Instrumentation):
+        # per-line and per-frame helpers stay unwrapped, their calls would cost more than they measure
+        instrumentation.wrap(self, self.COMMANDS, 'Collector.', {'serialize': self.written(self.file_name + '.json'), 'save': self.written()})
+        instrumentation.wrap(self.text, ['fetch', 'extract_pages'], 'Text.')
 
 
 class CommandlineCollector(cmd2.Cmd):
 
-    def __init__(self, filename:str):
+    def __init__(self, filename:str, text:Text = None, instrumentation:Instrumentation = None):
+        from journal import Journal
+        from history import History
         super().__init__()
         self.prompt = '>'
-        self.collector = Collector(filename)
+        self.collector = Collector(filename, text)
+        self.journal = Journal(self.collector)
+        self.validator = None
+        self.index = None
+        self.changes = []
+        self.tree = None
+        self.recorder = None
+        self.edits = History(self.collector)
+        self.instrumentation = None
+        if instrumentation is not None:
+            self.instrument(instrumentation)
+        if self.journal.exists():
+            print("Restored", self.journal.restore(), "journal entries from", self.journal.journal_file)
         self.print_status()
         
+    def precmd(self, statement):
+        if self.recorder is not None:
+            self.recorder.record(statement.command, statement.args)
+        if statement.command not in ['undo', 'redo', 'steps']:
+            self.edits.begin(statement.raw)
+        return statement
+
+    def postcmd(self, stop:bool, line) -> bool:
+        self.edits.commit()
+        self.journal.checkpoint()
+        return stop
+
+    def instrument(self, instrumentation:Instrumentation):
+        self.instrumentation = instrumentation
+        instrumentation.wrap(self, [n for n in vars(type(self)) if n.startswith('do_')], '', profile=True)
+        self.collector.instrument(instrumentation)
+        instrumentation.wrap(self.journal, ['checkpoint', 'compact', 'restore'], 'Journal.', {'checkpoint': lambda a, k, r: r, 'compact': lambda a, k, r: r})
+        if self.validator is not None:
+            instrumentation.wrap(self.validator, ['validate', 'rebuild', 'sync'], 'IncrementalValidator.')
+        
     def do_new(self, line:str):
-        match = re.search("(\w+)(( )(\w+)){0,1}$", line)
-        type = ""
-        set_char_ord = None
-        if match is not None:
-            type = match.group(1).lower()
-            set_char_ord = match.group(4)
-        if type == self.collector.BG.lower():
-            self.collector.new_document(line)
-        elif type == self.collector.BV.lower():
-            self.collector.new_document(line)
-        elif type == self.collector.KG.lower():
-            self.collector.new_document(line)
-        elif type == self.collector.KV.lower():
-            self.collector.new_document(line)
-        elif type == self.collector.KVO.lower():
-            self.collector.new_document(line)
-        elif self.collector.ABSCH.lower().startswith(type):
-            if set_char_ord is not None:
-                self.collector.new_char_abschnitt()
-            else:
-                self.collector.new_int_abschnitt()
-        elif self.collector.ABS.lower().startswith(type):
-            self.collector.new_absatz()
-        elif self.collector.PAR.lower().startswith(type):
-            if set_char_ord:
-                self.collector.new_paragraph(set_char_ord)
-            else:
-                self.collector.new_paragraph()
-        elif self.collector.ART.lower().startswith(type):
-            if set_char_ord:
-                self.collector.new_article(set_char_ord)
-            else:
-                self.collector.new_article()
-        elif self.collector.LIT.lower().startswith(type):
-            self.collector.new_litera()
-            self.collector.new_content()
-        else:
+        if not self.collector.new(line):
             print("Unknown type:",line)
         self.print_status()
 
     def do_end(self, line):
-        if self.collector.last().type in [ self.collector.LIT ] and self.collector.is_collecting():
-            self.collector.end()
-        self.collector.end()
+        self.collector.end_scope()
         self.print_status()
-        self.collector.serialize()
         
     def print_status(self):
         frame = self.collector.top()
@@ -548,7 +1003,8 @@ class CommandlineCollector(cmd2.Cmd):
             pos = frame.type + ( (" " + str(frame.ord)) if frame.ord is not None else "")
             if self.collector.is_collecting():
                 pos += ' ' + self.collector.cur_mode
-        print('['+ str(self.collector.text.line_no)+'/'+ str(len(self.collector.text.text)-1) + ' ' + pos + '] ' + '"' +self.collector.get_line() + '"')
+        line = self.collector.get_line()
+        print('['+ str(self.collector.text.line_no)+'/'+ str(self.collector.text.length()-1) + self.collector.text.progress() + ' ' + pos + '] ' + '"' + line + '"')
         
     def do_title(self, line:str):
         self.collector.new_title()
@@ -565,6 +1021,28 @@ class CommandlineCollector(cmd2.Cmd):
     def do_block(self, line:str):
         print(self.collector.next_block())
         self.print_status()
+
+    def do_goto(self, line:str):
+        if not line.strip().isdigit():
+            print("Usage: goto LINE")
+        elif not self.collector.text.has_line(int(line)):
+            print("Line", int(line), "is beyond the end of the text")
+        else:
+            self.collector.goto_line(int(line))
+        self.print_status()
+
+    def do_find(self, line:str):
+        if line.strip() == '':
+            print("Usage: find PATTERN")
+        elif self.collector.find_line(line.strip()) is None:
+            print("Not found:", line.strip())
+        self.print_status()
+
+    def do_skip(self, line:str):
+        count = int(line) if line.strip().isdigit() else 1
+        if self.collector.skip_blocks(count) is None:
+            print("Fewer than", count, "blocks left")
+        self.print_status()
         
     def do_show(self, line:str):
         print(self.collector.get_collect_content())
@@ -587,29 +1065,184 @@ class CommandlineCollector(cmd2.Cmd):
         
     def do_cancel(self, line:str):
         self.collector.cancel()
-        self.collector.serialize()
         self.print_status()
         
     def do_savestate(self, line:str):
         self.collector.serialize(line)
+        if self.index is not None:
+            from search import index_file
+            self.index.save(index_file(line if line else self.collector.file_name + '.json'))
         self.print_status()
 
     def do_restorestate(self, line:str):
         self.collector.deserialize(line)
+        if self.index is not None:
+            from search import index_file
+            self.index.load(index_file(line))
+        self.print_status()
+
+    def do_search(self, line:str):
+        from search import SearchIndex, QueryError
+        if self.index is None:
+            self.index = SearchIndex(self.collector)
+            self.index.load()
+        if line.strip() == 'save':
+            self.index.save()
+        elif line.strip() == '':
+            print('Usage: search QUERY | search save  (e.g. search "eidgenössische Jagdbanngebiete" OR wildschutz* -vogel)')
+        else:
+            try:
+                hits = self.index.search(line)
+                for hit in hits:
+                    print(hit)
+                print(len(hits), "hits")
+            except QueryError as e:
+                print(e)
         self.print_status()
         
+    def do_undo(self, line:str):
+        count = int(line) if line.strip().isdigit() else 1
+        if self.edits.undo(count) < count:
+            print("Nothing more to undo.")
+        self.print_status()
+
+    def do_redo(self, line:str):
+        count = int(line) if line.strip().isdigit() else 1
+        if self.edits.redo(count) < count:
+            print("Nothing more to redo.")
+        self.print_status()
+
+    def do_steps(self, line:str):
+        count = int(line) if line.strip().isdigit() else 10
+        for step in self.edits.undo_steps[-count:]:
+            print(step.label)
+        print(len(self.edits.undo_steps), "steps to undo,", len(self.edits.redo_steps), "to redo")
+        self.print_status()
+
+    def do_record(self, line:str):
+        from session import Recorder
+        if self.recorder is not None:
+            print("Recorded", self.recorder.commands, "commands to", self.recorder.file_name)
+            self.recorder.close()
+            self.recorder = None
+        if line.strip() == '':
+            print("Usage: record SESSION_FILE | record off")
+        elif line.strip() != 'off':
+            self.recorder = Recorder(line.strip(), self.collector)
+        self.print_status()
+
+    def do_cite(self, line:str):
+        from treeindex import TreeIndex
+        if self.tree is None:
+            self.tree = TreeIndex(self.collector)
+        if line.strip() == '':
+            print("Usage: cite CITATION  (e.g. cite Art. 5 Abs. 2 Bst. a)")
+        else:
+            origin = self.collector.top() if self.collector.depth() > 0 else None
+            frames = self.tree.resolve(line, origin)
+            for f in frames:
+                print("[" + str(f.line_no) + "]", f.id, self.tree.describe(f))
+            if len(frames) == 0:
+                print("Not found:", line.strip())
+            elif frames[0].line_no is not None:
+                self.collector.goto_line(frames[0].line_no)
+        self.print_status()
+
+    def do_diff(self, line:str):
+        from diff import StructuralDiff, load
+        args = line.split()
+        if len(args) not in (1, 2):
+            print("Usage: diff PREVIOUS_STATE [REPORT]")
+            self.print_status()
+            return
+        diff = StructuralDiff(load(args[0]), self.collector)
+        diff.carry_over()
+        if len(args) == 2:
+            with open(args[1], 'w') as f:
+                json.dump(diff.report(), f, indent=4)
+        self.changes = diff.changes
+        print(", ".join("{} {}".format(count, kind) for kind, count in diff.summary().items()))
+        self.print_status()
+
+    def do_review(self, line:str):
+        if line.strip() == 'list':
+            for c in self.changes:
+                print(c)
+        elif len(self.changes) == 0:
+            print("No changes left to review.")
+        else:
+            c = self.changes.pop(0)
+            print(c)
+            for name in c.fields:
+                print("-", repr(getattr(c.old, name)))
+                print("+", repr(getattr(c.new, name)))
+            if c.new is not None and c.new.line_no is not None:
+                self.collector.goto_line(c.new.line_no)
+            print(len(self.changes), "changes left")
+        self.print_status()
+
+    def do_auto(self, line:str):
+        from recogniser import recognise
+        for d in recognise(self.collector, line if line in self.collector.TYPES else None):
+            print(d)
+        self.print_status()
+
     def do_validate(self, line):
-        data = self.collector.build_graph()
-        model = Graph().parse("swisslaw.ttl", format="ttl")
-        a, b, result = validate(data+model)
+        from validation import IncrementalValidator
+        if self.validator is None:
+            self.validator = IncrementalValidator(self.collector)
+            if self.instrumentation is not None:
+                self.instrumentation.wrap(self.validator, ['validate', 'rebuild', 'sync'], 'IncrementalValidator.')
+        conforms, result = self.validator.validate(line.strip() == 'full')
         print(result)
         self.print_status()
 
+    def do_stats(self, line:str):
+        args = line.split()
+        command = args[0] if args else ''
+        if command == 'on':
+            if self.instrumentation is None:
+                self.instrument(Instrumentation())
+        elif self.instrumentation is None:
+            print("Instrumentation is off, use 'stats on' to enable it.")
+        elif command == 'off':
+            self.instrumentation.unwrap()
+            self.instrumentation = None
+        elif command == 'reset':
+            self.instrumentation.metrics.reset()
+        elif command == 'export' and len(args) == 2:
+            self.instrumentation.metrics.export(args[1])
+        elif command == 'profile' and len(args) == 2:
+            self.instrumentation.profile_dir = None if args[1] == 'off' else args[1]
+        elif command == '':
+            print(self.instrumentation.metrics.report())
+        else:
+            print("Usage: stats [on|off|reset|export FILE|profile DIR|profile off]")
+
 if __name__ == "__main__":
-    if len(sys.argv) <= 1 or len(sys.argv) > 2:
-        print("filename required")
-        exit()
-    filename = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Interactively collect the structure of a legal text.")
+    parser.add_argument('filename', help="PDF file to collect")
+    parser.add_argument('--no-cache', action='store_true', help="do not use the extracted-text cache")
+    parser.add_argument('--rebuild-cache', action='store_true', help="re-extract the PDF and replace its cache entry")
+    parser.add_argument('--cache-dir', default=None, help="cache directory (default: $SEMANTICLAW_CACHE or ~/.cache/semanticlaw)")
+    parser.add_argument('--previous', default=None, help="state file of the previous version: recognise the text, carry unchanged frames over and queue the changes for review")
+    parser.add_argument('--record', default=None, help="append every collection command with its line anchor to this session file (see session.py)")
+    parser.add_argument('--stats', action='store_true', help="time commands and collector calls (see the 'stats' command)")
+    parser.add_argument('--profile', default=None, help="write a cProfile dump of every command to this directory (implies --stats)")
+    parser.add_argument('--metrics', default=None, help="export the timings to this JSON file on exit (implies --stats)")
+    args = parser.parse_args()
     sys.argv = [sys.argv[0]]
-    app = CommandlineCollector(filename)
+    cache = None if args.no_cache else TextCache(args.cache_dir)
+    instrumentation = Instrumentation(profile_dir=args.profile) if args.stats or args.profile or args.metrics else None
+    app = CommandlineCollector(args.filename, Text(args.filename, cache=cache, refresh=args.rebuild_cache, background=True), instrumentation)
+    if args.previous is not None:
+        app.onecmd('auto')
+        app.onecmd('diff ' + args.previous)
+    if args.record is not None:
+        app.onecmd('record ' + args.record)
     app.cmdloop()
+    if app.recorder is not None:
+        app.recorder.close()
+    app.collector.text.stop()
+    if args.metrics is not None and app.instrumentation is not None:
+        app.instrumentation.metrics.export(args.metrics)
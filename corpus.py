@@ -0,0 +1,356 @@
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+from urllib.parse import quote, unquote
+from rdflib import Graph, Dataset, URIRef, BNode, Literal
+from rdflib.graph import DATASET_DEFAULT_GRAPH_ID
+from rdflib.store import Store, VALID_STORE, NO_STORE
+from collector import Collector, Text, EX, SL
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    datatype TEXT NOT NULL DEFAULT '',
+    lang TEXT NOT NULL DEFAULT '',
+    UNIQUE (kind, value, datatype, lang)
+);
+CREATE TABLE IF NOT EXISTS quads (
+    g INTEGER NOT NULL,
+    s INTEGER NOT NULL,
+    p INTEGER NOT NULL,
+    o INTEGER NOT NULL,
+    PRIMARY KEY (g, s, p, o)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS quads_spo ON quads (s, p, o);
+CREATE INDEX IF NOT EXISTS quads_pos ON quads (p, o, s);
+CREATE INDEX IF NOT EXISTS quads_osp ON quads (o, s, p);
+CREATE TABLE IF NOT EXISTS graphs (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    digest TEXT,
+    added REAL
+);
+CREATE TABLE IF NOT EXISTS namespaces (
+    prefix TEXT PRIMARY KEY,
+    uri TEXT NOT NULL
+);
+"""
+
+SELECT = """
+SELECT {distinct} q.s, q.p, q.o, s.kind, s.value, s.datatype, s.lang, p.value, o.kind, o.value, o.datatype, o.lang
+FROM quads q JOIN terms s ON s.id = q.s JOIN terms p ON p.id = q.p JOIN terms o ON o.id = q.o
+"""
+
+
+class SQLiteStore(Store):
+
+    context_aware = True
+    graph_aware = True
+    formula_aware = False
+    transaction_aware = True
+
+    CACHE_SIZE = 100000
+
+    def __init__(self, configuration:str = None, identifier = None):
+        self.connection = None
+        self.ids = {}
+        self.graphs = {}
+        super().__init__(configuration, identifier)
+
+    def open(self, configuration:str, create:bool = False) -> int:
+        if not create and not os.path.exists(configuration):
+            return NO_STORE
+        self.connection = sqlite3.connect(configuration)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction:bool = False):
+        if self.connection is not None:
+            if commit_pending_transaction:
+                self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+        # ids handed out inside the transaction point at rows that no longer exist
+        self.ids.clear()
+
+    def encode(self, term) -> tuple:
+        if isinstance(term, Literal):
+            return ('L', str(term), str(term.datatype) if term.datatype else '', term.language or '')
+        if isinstance(term, BNode):
+            return ('B', str(term), '', '')
+        return ('U', str(term), '', '')
+
+    def decode(self, kind:str, value:str, datatype:str = '', lang:str = ''):
+        if kind == 'L':
+            return Literal(value, lang=lang or None, datatype=URIRef(datatype) if datatype else None)
+        if kind == 'B':
+            return BNode(value)
+        return URIRef(value)
+
+    def term_id(self, term, create:bool = False) -> int:
+        key = self.encode(term)
+        id = self.ids.get(key)
+        if id is None:
+            row = self.connection.execute("SELECT id FROM terms WHERE kind=? AND value=? AND datatype=? AND lang=?", key).fetchone()
+            if row is None:
+                if not create:
+                    return None
+                id = self.connection.execute("INSERT INTO terms (kind, value, datatype, lang) VALUES (?, ?, ?, ?)", key).lastrowid
+            else:
+                id = row[0]
+            if len(self.ids) >= self.CACHE_SIZE:
+                self.ids.clear()
+            self.ids[key] = id
+        return id
+
+    def context_id(self, context, create:bool = False) -> int:
+        identifier = context.identifier if isinstance(context, Graph) else context
+        id = self.term_id(identifier, create)
+        if id is not None and create:
+            self.connection.execute("INSERT OR IGNORE INTO graphs (id) VALUES (?)", (id,))
+        return id
+
+    def graph(self, identifier) -> Graph:
+        graph = self.graphs.get(identifier)
+        if graph is None:
+            graph = self.graphs[identifier] = Graph(store=self, identifier=identifier)
+        return graph
+
+    def is_union(self, context) -> bool:
+        return context is None or context.identifier == DATASET_DEFAULT_GRAPH_ID
+
+    def add(self, triple, context, quoted:bool = False):
+        Store.add(self, triple, context, quoted)
+        self.addN([triple + (context,)])
+
+    def addN(self, quads):
+        rows = []
+        graphs = {}
+        for s, p, o, c in quads:
+            g = graphs.get(c.identifier)
+            if g is None:
+                g = graphs[c.identifier] = self.context_id(c, True)
+            rows.append((g, self.term_id(s, True), self.term_id(p, True), self.term_id(o, True)))
+            if len(rows) >= 10000:
+                self.connection.executemany("INSERT OR IGNORE INTO quads (g, s, p, o) VALUES (?, ?, ?, ?)", rows)
+                rows = []
+        self.connection.executemany("INSERT OR IGNORE INTO quads (g, s, p, o) VALUES (?, ?, ?, ?)", rows)
+
+    def where(self, triple, context, alias:str = 'q.') -> tuple:
+        clauses = []
+        params = []
+        for column, term in zip([alias + 's', alias + 'p', alias + 'o'], triple):
+            if term is not None:
+                id = self.term_id(term)
+                if id is None:
+                    return None
+                clauses.append(column + " = ?")
+                params.append(id)
+        if not self.is_union(context):
+            id = self.context_id(context)
+            if id is None:
+                return None
+            clauses.append(alias + "g = ?")
+            params.append(id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def remove(self, triple, context = None):
+        Store.remove(self, triple, context)
+        where = self.where(triple, context, '')
+        if where is not None:
+            self.connection.execute("DELETE FROM quads" + where[0], where[1])
+
+    def triples(self, triple, context = None):
+        where = self.where(triple, context)
+        if where is None:
+            return
+        sql, params = where
+        union = self.is_union(context)
+        cursor = self.connection.execute(SELECT.format(distinct='DISTINCT' if union else '') + sql, params)
+        for row in cursor:
+            t = (self.decode(*row[3:7]), URIRef(row[7]), self.decode(*row[8:12]))
+            yield t, (self.quad_contexts(row[0:3]) if union else iter([context]))
+
+    def quad_contexts(self, ids:tuple):
+        for row in self.connection.execute("SELECT t.value FROM quads q JOIN terms t ON t.id = q.g WHERE q.s=? AND q.p=? AND q.o=?", ids):
+            yield self.graph(URIRef(row[0]))
+
+    def __len__(self, context = None) -> int:
+        if self.is_union(context):
+            return self.connection.execute("SELECT COUNT(*) FROM (SELECT DISTINCT s, p, o FROM quads)").fetchone()[0]
+        id = self.context_id(context)
+        return 0 if id is None else self.connection.execute("SELECT COUNT(*) FROM quads WHERE g=?", (id,)).fetchone()[0]
+
+    def contexts(self, triple = None):
+        if triple is None:
+            rows = self.connection.execute("SELECT t.value FROM graphs g JOIN terms t ON t.id = g.id ORDER BY t.value").fetchall()
+        else:
+            ids = [self.term_id(term) for term in triple]
+            rows = [] if None in ids else self.connection.execute(
+                "SELECT t.value FROM quads q JOIN terms t ON t.id = q.g WHERE q.s=? AND q.p=? AND q.o=?", ids).fetchall()
+        for row in rows:
+            yield self.graph(URIRef(row[0]))
+
+    def add_graph(self, graph:Graph):
+        if graph.identifier != DATASET_DEFAULT_GRAPH_ID:
+            self.context_id(graph, True)
+
+    def remove_graph(self, graph:Graph):
+        id = self.context_id(graph)
+        if id is not None:
+            self.connection.execute("DELETE FROM quads WHERE g=?", (id,))
+            self.connection.execute("DELETE FROM graphs WHERE id=?", (id,))
+
+    def bind(self, prefix:str, namespace, override:bool = True):
+        if override or self.namespace(prefix) is None:
+            self.connection.execute("DELETE FROM namespaces WHERE uri=?", (str(namespace),))
+            self.connection.execute("INSERT OR REPLACE INTO namespaces (prefix, uri) VALUES (?, ?)", (prefix, str(namespace)))
+
+    def namespace(self, prefix:str):
+        row = self.connection.execute("SELECT uri FROM namespaces WHERE prefix=?", (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace):
+        row = self.connection.execute("SELECT prefix FROM namespaces WHERE uri=?", (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, uri in self.connection.execute("SELECT prefix, uri FROM namespaces").fetchall():
+            yield prefix, URIRef(uri)
+
+    def vacuum(self):
+        self.connection.execute("""
+            DELETE FROM terms WHERE id NOT IN (
+                SELECT s FROM quads UNION SELECT p FROM quads UNION SELECT o FROM quads UNION SELECT id FROM graphs)""")
+        self.ids.clear()
+        self.connection.commit()
+        self.connection.execute("VACUUM")
+
+
+class Corpus:
+
+    GRAPH = EX['graph/']
+
+    def __init__(self, file_name:str = 'corpus.sqlite'):
+        self.store = SQLiteStore()
+        self.store.open(file_name, create=True)
+        self.dataset = Dataset(store=self.store, default_union=True)
+        self.dataset.bind('', EX)
+        self.dataset.bind('sl', SL)
+        self.store.commit()
+
+    def close(self):
+        self.store.close(commit_pending_transaction=True)
+
+    def uri(self, name:str) -> URIRef:
+        return URIRef(self.GRAPH + quote(name))
+
+    def name(self, uri) -> str:
+        return unquote(str(uri)[len(self.GRAPH):])
+
+    def document(self, name:str) -> Graph:
+        return self.store.graph(self.uri(name))
+
+    def add(self, name:str, triples, source:str = None, digest:str = None) -> int:
+        graph = self.document(name)
+        try:
+            self.store.remove_graph(graph)
+            self.store.addN((s, p, o, graph) for s, p, o in triples)
+            id = self.store.context_id(graph, True)
+            self.store.connection.execute("UPDATE graphs SET source=?, digest=?, added=? WHERE id=?", (source, digest, time.time(), id))
+            self.store.commit()
+        except BaseException:
+            self.store.rollback()
+            raise
+        return len(graph)
+
+    def add_collector(self, collector:Collector, name:str = None, source:str = None) -> int:
+        return self.add(name if name is not None else os.path.basename(collector.file_name), collector.triples(), source)
+
+    def add_file(self, file_name:str, name:str = None, force:bool = False) -> int:
+        base = os.path.basename(file_name)
+        if base.endswith('.gz'):
+            base = base[0:-3]
+        name = name if name is not None else base[0:base.rfind('.')]
+        digest = self.digest(file_name)
+        if not force and self.store.connection.execute(
+                "SELECT 1 FROM graphs WHERE id=? AND digest=?", (self.store.term_id(self.uri(name)), digest)).fetchone():
+            return None
+        if base.endswith('.json'):
+            collector = Collector(file_name, Text.from_lines([]))
+            collector.deserialize(file_name)
+            return self.add(name, collector.triples(), file_name, digest)
+        graph = Graph()
+        format = 'nt' if base.endswith('.nt') else 'ttl'
+        with (gzip.open(file_name, 'rb') if file_name.endswith('.gz') else open(file_name, 'rb')) as f:
+            graph.parse(f, format=format)
+        return self.add(name, graph, file_name, digest)
+
+    def digest(self, file_name:str) -> str:
+        h = hashlib.sha256()
+        with open(file_name, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def remove(self, name:str):
+        self.store.remove_graph(self.document(name))
+        self.store.commit()
+
+    def documents(self) -> list[dict]:
+        rows = self.store.connection.execute("""
+            SELECT t.value, g.source, g.added, (SELECT COUNT(*) FROM quads q WHERE q.g = g.id)
+            FROM graphs g JOIN terms t ON t.id = g.id ORDER BY t.value""").fetchall()
+        return [{'name': self.name(uri), 'graph': uri, 'source': source, 'added': added, 'triples': count} for uri, source, added, count in rows]
+
+    def query(self, sparql:str):
+        return self.dataset.query(sparql)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep many collected legal texts in one SQLite-backed RDF store.")
+    parser.add_argument('database', help="SQLite corpus file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help="add or replace documents from .json state or .ttl/.nt(.gz) files")
+    add.add_argument('files', nargs='+')
+    add.add_argument('-f', '--force', action='store_true', help="reload files even if they did not change")
+    remove = commands.add_parser('remove', help="remove documents")
+    remove.add_argument('names', nargs='+')
+    commands.add_parser('list', help="list the documents")
+    query = commands.add_parser('query', help="run a SPARQL query over all documents (use GRAPH for a single one)")
+    query.add_argument('sparql', help="query text, or @file to read it from a file")
+    commands.add_parser('vacuum', help="drop unused terms and compact the database")
+    args = parser.parse_args()
+    corpus = Corpus(args.database)
+    if args.command == 'add':
+        for file_name in args.files:
+            count = corpus.add_file(file_name, force=args.force)
+            print(file_name, "unchanged" if count is None else str(count) + " triples")
+    elif args.command == 'remove':
+        for name in args.names:
+            corpus.remove(name)
+    elif args.command == 'list':
+        for d in corpus.documents():
+            print("{:<40} {:>8} triples  {}".format(d['name'], d['triples'], d['source'] or ''))
+    elif args.command == 'query':
+        sparql = args.sparql
+        if sparql.startswith('@'):
+            with open(sparql[1:], 'r') as f:
+                sparql = f.read()
+        for row in corpus.query(sparql):
+            print(" ".join(str(v) for v in row) if isinstance(row, tuple) else row)
+    elif args.command == 'vacuum':
+        corpus.store.vacuum()
+    corpus.close()
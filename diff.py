@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import json
+import re
+from collector import Collector, Frame, Text
+from recogniser import recognise
+
+SPACE = re.compile(r'\s+')
+
+
+def normalise(text:str) -> str:
+    return SPACE.sub(' ', text).strip() if text is not None else ''
+
+
+def digest(*parts:str) -> bytes:
+    return hashlib.blake2b('\0'.join(parts).encode('utf-8'), digest_size=16).digest()
+
+
+class Hashes:
+
+    def __init__(self, collector:Collector):
+        self.collector = collector
+        self.content = {}
+        self.frame = {}
+        self.subtree = {}
+        for f in collector.sequence:
+            self.content[f.id] = digest(f.type or '', normalise(f.title), normalise(f.content))
+            self.frame[f.id] = digest(self.content[f.id].hex(), str(f.ord))
+        # the sequence lists parents before their children
+        for f in reversed(collector.sequence):
+            self.subtree[f.id] = hashlib.blake2b(self.frame[f.id] + b''.join(self.subtree[c.id] for c in collector.get_children(f.id)), digest_size=16).digest()
+
+
+class Change:
+
+    ADDED = 'added'
+    REMOVED = 'removed'
+    MODIFIED = 'modified'
+    MOVED = 'moved'
+
+    def __init__(self, kind:str, old:Frame = None, new:Frame = None, fields:list[str] = None):
+        self.kind = kind
+        self.old = old
+        self.new = new
+        self.fields = fields if fields is not None else []
+
+    def frame(self) -> Frame:
+        return self.new if self.new is not None else self.old
+
+    def __str__(self):
+        f = self.frame()
+        where = "[" + str(f.line_no) + "] " if self.new is not None else "[was " + str(f.line_no) + "] "
+        return where + self.kind + " " + f.type + (" " + str(f.ord) if f.ord is not None else "") + (" (" + ", ".join(self.fields) + ")" if self.fields else "")
+
+
+class StructuralDiff:
+
+    def __init__(self, old:Collector, new:Collector):
+        self.old = old
+        self.new = new
+        self.old_hashes = Hashes(old)
+        self.new_hashes = Hashes(new)
+        self.matches = {}
+        self.matched_old = set()
+        self.changes = []
+        self.unchanged = 0
+        self.match()
+
+    def pair(self, old:Frame, new:Frame):
+        self.matches[new.id] = old.id
+        self.matched_old.add(old.id)
+
+    def pair_subtree(self, old:Frame, new:Frame):
+        stack = [(old, new)]
+        while stack:
+            o, n = stack.pop()
+            self.pair(o, n)
+            stack.extend(zip(self.old.get_children(o.id), self.new.get_children(n.id)))
+
+    def match(self):
+        queue = [(None, None)]
+        moved = []
+        while queue:
+            old_parent, new_parent = queue.pop()
+            old_children = [f for f in self.old.get_children(old_parent) if f.id not in self.matched_old]
+            new_children = [f for f in self.new.get_children(new_parent) if f.id not in self.matches]
+            # identical subtrees first, then frames whose text survived a renumbering, then by type and ordinal
+            for key, old_key, new_key in [('subtree', lambda f: self.old_hashes.subtree[f.id], lambda f: self.new_hashes.subtree[f.id]),
+                                          ('content', lambda f: self.old_hashes.content[f.id], lambda f: self.new_hashes.content[f.id]),
+                                          ('ord', lambda f: (f.type, str(f.ord)), lambda f: (f.type, str(f.ord)))]:
+                candidates = {}
+                for f in old_children:
+                    candidates.setdefault(old_key(f), []).append(f)
+                remaining = []
+                for n in new_children:
+                    found = candidates.get(new_key(n))
+                    if not found:
+                        remaining.append(n)
+                        continue
+                    o = found.pop(0)
+                    if key == 'subtree':
+                        self.pair_subtree(o, n)
+                    else:
+                        self.pair(o, n)
+                        queue.append((o.id, n.id))
+                new_children = remaining
+                old_children = [f for f in old_children if f.id not in self.matched_old]
+            moved += new_children
+        # whole subtrees that changed parent
+        candidates = {}
+        for f in self.old.sequence:
+            if f.id not in self.matched_old:
+                candidates.setdefault(self.old_hashes.subtree[f.id], []).append(f)
+        for n in moved:
+            found = candidates.get(self.new_hashes.subtree[n.id])
+            while found and found[0].id in self.matched_old:
+                found.pop(0)
+            if found:
+                o = found.pop(0)
+                self.pair_subtree(o, n)
+                self.changes.append(Change(Change.MOVED, o, n))
+        self.classify()
+
+    def classify(self):
+        moved = set(c.new.id for c in self.changes)
+        for n in self.new.sequence:
+            if n.id not in self.matches:
+                self.changes.append(Change(Change.ADDED, new=n))
+            elif n.id not in moved:
+                o = self.old.get(self.matches[n.id])
+                fields = [name for name in ['type', 'ord'] if str(getattr(o, name)) != str(getattr(n, name))]
+                fields += [name for name in ['title', 'content'] if normalise(getattr(o, name)) != normalise(getattr(n, name))]
+                if fields:
+                    self.changes.append(Change(Change.MODIFIED, o, n, fields))
+                else:
+                    self.unchanged += 1
+        for o in self.old.sequence:
+            if o.id not in self.matched_old:
+                self.changes.append(Change(Change.REMOVED, old=o))
+
+    def carry_over(self):
+        new = self.new
+        mapping = {}
+        last_id = self.old.last_id
+        for f in new.sequence:
+            if f.id in self.matches:
+                mapping[f.id] = self.matches[f.id]
+            else:
+                last_id = Collector.ID.increment(last_id)
+                mapping[f.id] = last_id
+        for f in new.sequence:
+            f.id = mapping[f.id]
+            f.parent = mapping.get(f.parent)
+            f.prev = mapping.get(f.prev)
+            f.next = mapping.get(f.next)
+        self.matches = {id: id for id in self.matches.values()}
+        new.restore(new.sequence, {
+            'last_id': last_id,
+            'hierarchy': [f.id for f in new.hierarchy],
+            'text_line_no': new.text.line_no,
+            'cur_mode': new.cur_mode,
+            'cur_start': new.cur_start
+        })
+
+    def path(self, collector:Collector, f:Frame) -> str:
+        path = []
+        while f is not None:
+            path.insert(0, f.type + (" " + str(f.ord) if f.ord is not None else ""))
+            f = collector.get(f.parent)
+        return " > ".join(path)
+
+    def summary(self) -> dict:
+        result = {Change.ADDED: 0, Change.REMOVED: 0, Change.MODIFIED: 0, Change.MOVED: 0, 'unchanged': self.unchanged}
+        for c in self.changes:
+            result[c.kind] += 1
+        return result
+
+    def report(self) -> dict:
+        changes = []
+        for c in self.changes:
+            entry = {'change': c.kind, 'id': c.frame().id, 'type': c.frame().type, 'ord': c.frame().ord}
+            if c.old is not None:
+                entry['old_path'] = self.path(self.old, c.old)
+                entry['old_line_no'] = c.old.line_no
+            if c.new is not None:
+                entry['path'] = self.path(self.new, c.new)
+                entry['line_no'] = c.new.line_no
+            if c.fields:
+                entry['fields'] = c.fields
+                entry['old'] = {name: getattr(c.old, name) for name in c.fields}
+            changes.append(entry)
+        return {
+            'old': self.old.file_name,
+            'new': self.new.file_name,
+            'summary': self.summary(),
+            'changes': changes
+        }
+
+
+def load(file_name:str) -> Collector:
+    if file_name.lower().endswith('.pdf'):
+        collector = Collector(file_name)
+        recognise(collector)
+        return collector
+    collector = Collector(file_name, Text.from_lines([]))
+    collector.deserialize(file_name)
+    return collector
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two versions of an act and carry the frame ids of unchanged parts over to the new version.")
+    parser.add_argument('old', help="state file of the previous version (.json or .state)")
+    parser.add_argument('new', help="PDF of the new version (recognised automatically) or its state file")
+    parser.add_argument('-r', '--report', default=None, help="write the change report to this JSON file")
+    parser.add_argument('-s', '--state', default=None, help="write the new version with carried-over ids to this state file")
+    args = parser.parse_args()
+    diff = StructuralDiff(load(args.old), load(args.new))
+    if args.state is not None:
+        diff.carry_over()
+        diff.new.serialize(args.state)
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump(diff.report(), f, indent=4)
+    for c in diff.changes:
+        print(c)
+    print(", ".join("{} {}".format(count, kind) for kind, count in diff.summary().items()))
@@ -0,0 +1,169 @@
+from collector import Collector, Frame
+
+FIELDS = [name for name in Frame.__slots__ if name != 'id']
+
+
+def fields(f:Frame) -> tuple:
+    return tuple(getattr(f, name) for name in FIELDS)
+
+
+class Step:
+
+    __slots__ = ('label', 'low', 'before_tail', 'after_tail', 'before_fields', 'after_fields', 'before_cursor', 'after_cursor')
+
+    def __init__(self, label:str, low:int, before_tail:list, after_tail:list, before_fields:list, after_fields:list, before_cursor:tuple, after_cursor:tuple):
+        self.label = label
+        self.low = low
+        self.before_tail = before_tail
+        self.after_tail = after_tail
+        self.before_fields = before_fields
+        self.after_fields = after_fields
+        self.before_cursor = before_cursor
+        self.after_cursor = after_cursor
+
+    def size(self) -> int:
+        return len(self.before_tail) + len(self.after_tail) + len(self.before_fields)
+
+
+class History:
+
+    def __init__(self, collector:Collector, limit:int = None):
+        self.collector = collector
+        self.limit = limit
+        self.undo_steps = []
+        self.redo_steps = []
+        self.pending = None
+        self.replaying = False
+        collector.add_observer(self)
+
+    def cursor(self) -> tuple:
+        c = self.collector
+        # the hierarchy is at most one frame per structural level deep, so copying it is constant-size
+        return (tuple(c.hierarchy), c.last_id, c.text.line_no, c.cur_mode, c.cur_start)
+
+    def frame_changed(self, f:Frame):
+        if self.pending is None or self.replaying:
+            return
+        if f.id in self.pending['captured'] or f.id in self.pending['new']:
+            return
+        # Collector.append announces every new frame while it is the last one
+        if self.collector.length() > 0 and self.collector.last() is f:
+            self.pending['new'].add(f.id)
+        else:
+            # a frame outside the stack changed behind our back: its old values are gone
+            self.pending['lost'] = True
+
+    def frame_removed(self, f:Frame):
+        if self.pending is None or self.replaying:
+            return
+        # the collector only ever removes the last frame of the sequence
+        c = self.collector
+        index = c.length()
+        if index < self.pending['low']:
+            self.pending['low'] = index
+            if index < self.pending['length']:
+                self.pending['before_tail'].insert(0, f)
+        # cancel goes on to clear the next pointer of the frame that is now last
+        if 0 < index <= self.pending['length'] and c.last().id not in self.pending['captured']:
+            self.pending['captured'][c.last().id] = (c.last(), fields(c.last()))
+
+    def state_loaded(self):
+        if not self.replaying:
+            self.clear()
+
+    def clear(self):
+        self.undo_steps = []
+        self.redo_steps = []
+        self.pending = None
+
+    def begin(self, label:str = None):
+        if self.pending is not None:
+            self.commit()
+        c = self.collector
+        captured = {f.id: (f, fields(f)) for f in c.hierarchy}
+        if c.length() > 0:
+            captured[c.last().id] = (c.last(), fields(c.last()))
+        self.pending = {
+            'label': label,
+            'length': c.length(),
+            'low': c.length(),
+            'before_tail': [],
+            'captured': captured,
+            'new': set(),
+            'cursor': self.cursor(),
+            'lost': False
+        }
+
+    def commit(self) -> Step:
+        p = self.pending
+        if p is None:
+            return None
+        self.pending = None
+        if p['lost']:
+            self.clear()
+            return None
+        c = self.collector
+        after_tail = c.sequence[p['low']:]
+        before_fields = []
+        after_fields = []
+        for id, (f, values) in p['captured'].items():
+            current = fields(f)
+            if current != values:
+                before_fields.append((f, values))
+                after_fields.append((f, current))
+        cursor = self.cursor()
+        if len(after_tail) == 0 and len(p['before_tail']) == 0 and len(before_fields) == 0 and cursor == p['cursor']:
+            return None
+        step = Step(p['label'], p['low'], p['before_tail'], after_tail, before_fields, after_fields, p['cursor'], cursor)
+        self.undo_steps.append(step)
+        self.redo_steps = []
+        if self.limit is not None and len(self.undo_steps) > self.limit:
+            self.undo_steps.pop(0)
+        return step
+
+    def apply(self, step:Step, undo:bool):
+        c = self.collector
+        remove, add = (step.after_tail, step.before_tail) if undo else (step.before_tail, step.after_tail)
+        values = step.before_fields if undo else step.after_fields
+        cursor = step.before_cursor if undo else step.after_cursor
+        self.replaying = True
+        try:
+            for f in reversed(remove):
+                c.ordinals.remove(f)
+                c.unindex(c.sequence.pop())
+                c.removed(f)
+            for f, v in values:
+                for name, value in zip(FIELDS, v):
+                    setattr(f, name, value)
+            for f in add:
+                c.sequence.append(f)
+                c.index(f)
+                c.ordinals.add(f)
+                c.changed(f)
+            for f, v in values:
+                if c.get(f.id) is f:
+                    c.changed(f)
+            hierarchy, c.last_id, c.text.line_no, c.cur_mode, c.cur_start = cursor
+            c.hierarchy = list(hierarchy)
+        finally:
+            self.replaying = False
+
+    def undo(self, count:int = 1) -> int:
+        self.commit()
+        done = 0
+        while done < count and self.undo_steps:
+            step = self.undo_steps.pop()
+            self.apply(step, True)
+            self.redo_steps.append(step)
+            done += 1
+        return done
+
+    def redo(self, count:int = 1) -> int:
+        self.commit()
+        done = 0
+        while done < count and self.redo_steps:
+            step = self.redo_steps.pop()
+            self.apply(step, False)
+            self.undo_steps.append(step)
+            done += 1
+        return done
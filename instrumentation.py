@@ -0,0 +1,142 @@
+import cProfile
+import inspect
+import json
+import os
+import time
+from functools import wraps
+
+
+class Metrics:
+
+    def __init__(self):
+        self.samples = {}
+        self.written = {}
+
+    def record(self, name:str, seconds:float, written:int = 0):
+        self.samples.setdefault(name, []).append(seconds)
+        if written:
+            self.written[name] = self.written.get(name, 0) + written
+
+    def reset(self):
+        self.samples = {}
+        self.written = {}
+
+    def state(self) -> dict:
+        return {'samples': self.samples, 'written': self.written}
+
+    def merge(self, state:dict):
+        for name, samples in state['samples'].items():
+            self.samples.setdefault(name, []).extend(samples)
+        for name, written in state['written'].items():
+            self.written[name] = self.written.get(name, 0) + written
+
+    @staticmethod
+    def percentile(values:list[float], p:float) -> float:
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    def summary(self) -> dict:
+        result = {}
+        for name, samples in self.samples.items():
+            values = sorted(samples)
+            result[name] = {
+                'count': len(values),
+                'total': sum(values),
+                'p50': self.percentile(values, 50),
+                'p95': self.percentile(values, 95),
+                'max': values[-1],
+                'bytes': self.written.get(name, 0)
+            }
+        return result
+
+    def report(self) -> str:
+        summary = self.summary()
+        if len(summary) == 0:
+            return "No calls recorded."
+        lines = ["{:<32} {:>7} {:>10} {:>10} {:>10} {:>10} {:>12}".format('name', 'count', 'total s', 'p50 ms', 'p95 ms', 'max ms', 'bytes')]
+        for name, s in sorted(summary.items(), key=lambda item: -item[1]['total']):
+            lines.append("{:<32} {:>7} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>12}".format(
+                name, s['count'], s['total'], s['p50'] * 1000, s['p95'] * 1000, s['max'] * 1000, s['bytes']))
+        return "\n".join(lines)
+
+    def export(self, file_name:str):
+        with open(file_name, 'w') as f:
+            json.dump(self.summary(), f, indent=4)
+
+
+class Instrumentation:
+
+    def __init__(self, metrics:Metrics = None, profile_dir:str = None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.profile_dir = profile_dir
+        self.profiles = 0
+        self.installed = []
+
+    def wrap(self, obj, names:list[str], prefix:str, written:dict = None, profile:bool = False):
+        written = written if written is not None else {}
+        for name in names:
+            if name in vars(obj):
+                continue
+            setattr(obj, name, self.timed(prefix + name, getattr(obj, name), written.get(name), profile))
+            self.installed.append((obj, name))
+
+    def unwrap(self):
+        for obj, name in self.installed:
+            vars(obj).pop(name, None)
+        self.installed = []
+
+    def timed(self, name:str, fn, written = None, profile:bool = False):
+        if inspect.isgeneratorfunction(fn):
+            return self.timed_generator(name, fn, profile)
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = None
+            if profile and self.profile_dir is not None:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                self.finish(name, time.perf_counter() - start, profiler)
+                raise
+            elapsed = time.perf_counter() - start
+            self.finish(name, elapsed, profiler, written(args, kwargs, result) if written else 0)
+            return result
+        return wrapper
+
+    def timed_generator(self, name:str, fn, profile:bool = False):
+        # only the time spent producing the items counts, not the time the consumer spends between them
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = cProfile.Profile() if profile and self.profile_dir is not None else None
+            elapsed = 0.0
+            iterator = fn(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    if profiler is not None:
+                        profiler.enable()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        if profiler is not None:
+                            profiler.disable()
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                iterator.close()
+                self.finish(name, elapsed, profiler)
+        return wrapper
+
+    def finish(self, name:str, seconds:float, profiler:cProfile.Profile, written:int = 0):
+        self.metrics.record(name, seconds, written)
+        if profiler is not None:
+            profiler.disable()
+            self.dump(profiler, name)
+
+    def dump(self, profiler:cProfile.Profile, name:str):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.profiles += 1
+        profiler.dump_stats(os.path.join(self.profile_dir, "{:04d}_{}.prof".format(self.profiles, name)))
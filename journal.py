@@ -0,0 +1,147 @@
+import json
+import os
+from collector import Collector, Frame
+
+
+class Journal:
+
+    COMPACT_EVERY = 500
+
+    def __init__(self, collector:Collector, base_name:str = None, compact_every:int = COMPACT_EVERY):
+        self.collector = collector
+        base_name = base_name if base_name is not None else collector.file_name
+        self.snapshot_file = base_name + '.snapshot.json'
+        self.journal_file = base_name + '.journal'
+        self.compact_every = compact_every
+        self.dirty = {}
+        self.removed = []
+        self.cursor = None
+        self.entries = 0
+        self.reset = False
+        collector.add_observer(self)
+
+    def frame_changed(self, f:Frame):
+        self.dirty[f.id] = f
+
+    def frame_removed(self, f:Frame):
+        self.dirty.pop(f.id, None)
+        self.removed.append(f.id)
+
+    def state_loaded(self):
+        self.reset = True
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_file) or os.path.exists(self.journal_file)
+
+    def get_cursor(self) -> dict:
+        c = self.collector
+        return {
+            'hierarchy': [f.id for f in c.hierarchy],
+            'last_id': c.last_id,
+            'text_line_no': c.text.line_no,
+            'cur_mode': c.cur_mode,
+            'cur_start': c.cur_start
+        }
+
+    def checkpoint(self) -> int:
+        if self.reset:
+            return self.compact()
+        cursor = self.get_cursor()
+        if len(self.dirty) == 0 and len(self.removed) == 0 and cursor == self.cursor:
+            return 0
+        record = dict(cursor)
+        record['removed'] = self.removed
+        record['frames'] = [f.serialize() for f in self.dirty.values()]
+        data = (json.dumps(record) + '\n').encode('utf-8')
+        with open(self.journal_file, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.dirty = {}
+        self.removed = []
+        self.cursor = cursor
+        self.entries += 1
+        if self.entries >= self.compact_every:
+            self.compact()
+        return len(data)
+
+    def compact(self) -> int:
+        data = json.dumps(self.collector.state()).encode('utf-8')
+        tmp = self.snapshot_file + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_file)
+        self.sync_directory()
+        with open(self.journal_file, 'wb') as f:
+            os.fsync(f.fileno())
+        self.dirty = {}
+        self.removed = []
+        self.cursor = self.get_cursor()
+        self.entries = 0
+        self.reset = False
+        return len(data)
+
+    def sync_directory(self):
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(os.path.dirname(os.path.abspath(self.snapshot_file)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def restore(self) -> int:
+        c = self.collector
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r') as f:
+                c.load_state(json.load(f))
+        count = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self.apply(record)
+                    count += 1
+        self.dirty = {}
+        self.removed = []
+        self.cursor = self.get_cursor()
+        self.entries = count
+        self.reset = False
+        return count
+
+    def apply(self, record:dict):
+        c = self.collector
+        reindex = False
+        for id in record['removed']:
+            f = c.get(id)
+            if f is None:
+                continue
+            if c.length() > 0 and c.last() is f:
+                c.ordinals.remove(f)
+                c.sequence.pop()
+                c.unindex(f)
+            else:
+                c.sequence.remove(f)
+                reindex = True
+        for d in record['frames']:
+            f = c.get(d['id'])
+            if f is None:
+                f = Frame.deserialize(d)
+                c.sequence.append(f)
+                c.index(f)
+                c.ordinals.add(f)
+            else:
+                reindex = reindex or f.ord != d['ord'] or f.parent != d['parent']
+                for key, value in d.items():
+                    setattr(f, key, value)
+        if reindex:
+            c.reindex()
+        c.hierarchy = [c.get(id) for id in record['hierarchy']]
+        c.last_id = record['last_id']
+        c.text.line_no = record['text_line_no']
+        c.cur_mode = record['cur_mode']
+        c.cur_start = record['cur_start']
@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+from instrumentation import Metrics
+
+QUERY = "PREFIX sl: <https://raw.githubusercontent.com/mathiasrichter/semanticlaw/main/swisslaw.ttl#> SELECT ?s ?ord WHERE { ?s a sl:Artikel ; sl:ord ?ord } LIMIT 50"
+
+
+def fetch(url:str) -> tuple:
+    try:
+        with urlopen(url) as response:
+            return response.status, response.read()
+    except HTTPError as e:
+        return e.code, e.read()
+
+
+def requests(base:str, count:int, seed:int = 0) -> list[tuple]:
+    documents = json.loads(fetch(base + '/documents')[1])
+    frames = []
+    for d in documents:
+        tree = json.loads(fetch(base + '/subtree/' + quote(d['name']) + '/' + quote(root_id(base, d['name'])) + '?depth=1')[1])
+        frames += [(d['name'], child['id'], child['ord']) for child in tree['children']]
+        for child in tree['children']:
+            sub = json.loads(fetch(base + '/subtree/' + quote(d['name']) + '/' + quote(child['id']) + '?depth=1')[1])
+            frames += [(d['name'], f['id'], f['ord']) for f in sub['children'] if f['type'] in ('Artikel', 'Paragraph')]
+    random.seed(seed)
+    result = []
+    for i in range(count):
+        name, id, ord = random.choice(frames)
+        kind = random.choice(['subtree', 'frame', 'cite', 'sparql'])
+        if kind == 'cite':
+            result.append(('cite', base + '/cite?' + urlencode({'q': 'Art. ' + str(ord) + ' Abs. 1', 'doc': name})))
+        elif kind == 'sparql':
+            result.append(('sparql', base + '/sparql?' + urlencode({'query': QUERY})))
+        else:
+            result.append((kind, base + '/' + kind + '/' + quote(name) + '/' + quote(id)))
+    return result
+
+
+def root_id(base:str, name:str) -> str:
+    query = "SELECT ?s WHERE { GRAPH <%s> { ?s ?p ?o FILTER NOT EXISTS { ?s <https://raw.githubusercontent.com/mathiasrichter/semanticlaw/main/swisslaw.ttl#parent> ?x } } } LIMIT 1" % (
+        [d for d in json.loads(fetch(base + '/documents')[1]) if d['name'] == name][0]['graph'])
+    result = json.loads(fetch(base + '/sparql?' + urlencode({'query': query}))[1])
+    return result['results']['bindings'][0]['s']['value'].rsplit('/', 1)[-1]
+
+
+def run(base:str, threads:int, seconds:float, distinct:int, seed:int = 0) -> tuple:
+    urls = requests(base, distinct, seed)
+    metrics = Metrics()
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    def worker(n:int):
+        rnd = random.Random(seed + n)
+        while time.perf_counter() < deadline:
+            kind, url = rnd.choice(urls)
+            start = time.perf_counter()
+            status, body = fetch(url)
+            elapsed = time.perf_counter() - start
+            with lock:
+                metrics.record(kind, elapsed, len(body))
+                metrics.record('all', elapsed, len(body))
+                if status != 200:
+                    errors.append((status, url))
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return metrics, errors, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a running server.py on localhost with a mix of subtree, frame, citation and SPARQL requests.")
+    parser.add_argument('-u', '--url', default='http://localhost:8642', help="server base URL")
+    parser.add_argument('-t', '--threads', type=int, default=8, help="concurrent clients")
+    parser.add_argument('-d', '--duration', type=float, default=10, help="seconds to run")
+    parser.add_argument('-n', '--distinct', type=int, default=200, help="number of distinct requests to draw from (controls the cache hit rate)")
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-o', '--out', default=None, help="export the latency summary to this JSON file")
+    args = parser.parse_args()
+    metrics, errors, elapsed = run(args.url.rstrip('/'), args.threads, args.duration, args.distinct, args.seed)
+    print(metrics.report())
+    total = len(metrics.samples.get('all', []))
+    print("{} requests in {:.2f}s, {:.1f} req/s, {} errors".format(total, elapsed, total / elapsed if elapsed else 0, len(errors)))
+    print("cache:", fetch(args.url.rstrip('/') + '/cache')[1].decode('utf-8'))
+    if args.out is not None:
+        metrics.export(args.out)
@@ -0,0 +1,95 @@
+import gzip
+from rdflib import URIRef, Literal, RDF
+from rdflib.namespace import XSD
+
+
+def escape(value:str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class NTriplesWriter:
+
+    def __init__(self, out):
+        self.out = out
+
+    def term(self, t) -> str:
+        if isinstance(t, Literal):
+            result = '"' + escape(str(t)) + '"'
+            if t.language is not None:
+                return result + '@' + t.language
+            if t.datatype is not None and t.datatype != XSD.string:
+                return result + '^^<' + str(t.datatype) + '>'
+            return result
+        return '<' + str(t) + '>'
+
+    def begin(self):
+        pass
+
+    def end(self):
+        pass
+
+    def write(self, triples):
+        self.begin()
+        for s, p, o in triples:
+            self.out.write(self.term(s) + ' ' + self.term(p) + ' ' + self.term(o) + ' .\n')
+        self.end()
+
+
+class TurtleWriter(NTriplesWriter):
+
+    def __init__(self, out, prefixes:dict = None):
+        super().__init__(out)
+        self.prefixes = prefixes if prefixes is not None else {}
+        self.subject = None
+
+    def term(self, t) -> str:
+        if isinstance(t, URIRef):
+            for prefix, ns in self.prefixes.items():
+                if t.startswith(ns) and self.is_local_name(t[len(ns):]):
+                    return prefix + ':' + t[len(ns):]
+            return '<' + str(t) + '>'
+        if isinstance(t, Literal) and t.datatype == XSD.integer:
+            return str(t)
+        return super().term(t)
+
+    def is_local_name(self, name:str) -> bool:
+        return name != '' and name.replace('_', 'a').replace('-', 'a').isalnum() and not name[0].isdigit() and not name.endswith('-')
+
+    def begin(self):
+        for prefix, ns in self.prefixes.items():
+            self.out.write('@prefix ' + prefix + ': <' + ns + '> .\n')
+        self.out.write('\n')
+        self.subject = None
+
+    def end(self):
+        if self.subject is not None:
+            self.out.write(' .\n')
+        self.subject = None
+
+    def write(self, triples):
+        self.begin()
+        for s, p, o in triples:
+            if s != self.subject:
+                if self.subject is not None:
+                    self.out.write(' .\n\n')
+                self.out.write(self.term(s) + ' ')
+                self.subject = s
+            else:
+                self.out.write(' ;\n    ')
+            self.out.write(('a' if p == RDF.type else self.term(p)) + ' ' + self.term(o))
+        self.end()
+
+
+def open_output(file_name:str, compress:bool = None):
+    if compress is None:
+        compress = file_name.endswith('.gz')
+    if compress:
+        return gzip.open(file_name, 'wt', encoding='utf-8')
+    return open(file_name, 'w', encoding='utf-8')
+
+
+def format_for(file_name:str) -> str:
+    name = file_name[0:-3] if file_name.endswith('.gz') else file_name
+    if name.endswith('.nt'):
+        return 'nt'
+    return 'ttl'
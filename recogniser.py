@@ -0,0 +1,327 @@
+import re
+import sys
+from collector import Collector
+
+
+class Doubt:
+
+    def __init__(self, line_no:int, message:str):
+        self.line_no = line_no
+        self.message = message
+
+    def __str__(self):
+        return "[" + str(self.line_no) + "] " + self.message
+
+
+class StructureRecogniser:
+
+    BLANK = re.compile(r'^\s*$')
+    ABSCHNITT = re.compile(r'^\s*(\d+)([a-z]*)\.\s*Abschnitt\b')
+    CHAR_ABSCHNITT = re.compile(r'^\s*([A-Z])\.\s*Abschnitt\b')
+    ARTIKEL = re.compile(r'^\s*Art\.\s*(\d+)([a-z]*)\s*(.*)$')
+    PARAGRAPH = re.compile(r'^\s*§\s*(\d+)([a-z]*)\s*(.*)$')
+    ABSATZ = re.compile(r'^\s*(\d+)(bis|ter|quater|quinquies|sexies|septies|octies|novies|decies)?\s+\S')
+    LITERA = re.compile(r'^\s*([a-z]{1,2})\.\d*(\s|$)')
+    LABEL_ONLY = re.compile(r'^\s*[a-z]{1,2}\.\d*\s*$')
+    FOOTNOTE = re.compile(r'^\s*\d+\s+(SR|AS|BBl|Fassung|Eingefügt|Aufgehoben|Ausdruck|Bezeichnung|Berichtigt|Siehe|Heute|Die Bezeichnung|Die Berichtigung)\b')
+    PAGE = re.compile(r'^\s*\d+(\.\d+)*\s*$')
+    HEADER = re.compile(r'^\s*\S+(\s+\S+){0,2}\s*$')
+    PUNCTUATED = re.compile(r'[.,;:]\s*$')
+    TITLE_END = re.compile(r'(^|\s)vom\s+\d+\.\s*\S+\s+\d{4}')
+    PREAMBLE_END = re.compile(r'(beschliesst|verordnet)\s*:\s*$')
+
+    TEXT = 'text'
+    NOISE = 'noise'
+
+    LEVELS = {
+        Collector.BG: 0, Collector.BV: 0, Collector.KG: 0, Collector.KVO: 0, Collector.KV: 0,
+        Collector.ABSCH: 1, Collector.ART: 2, Collector.PAR: 2, Collector.ABS: 3, Collector.LIT: 4
+    }
+
+    def __init__(self, collector:Collector, document_type:str = None):
+        self.collector = collector
+        self.document_type = document_type
+        self.doubts = []
+        self.end = None
+        self.blocks = 0
+        self.max_blocks = 0
+        self.prev_blank = True
+        self.in_noise = False
+        self.after_noise = False
+
+    def doubt(self, line_no:int, message:str):
+        self.doubts.append(Doubt(line_no, message))
+
+    def text(self, i:int) -> str:
+        return self.collector.text.line(i)
+
+    def has_text(self, i:int) -> bool:
+        return self.collector.text.has_line(i)
+
+    def is_blank(self, line:str) -> bool:
+        return self.BLANK.match(line) is not None
+
+    def run(self) -> list[Doubt]:
+        i = self.collector.text.line_no
+        if self.collector.depth() == 0:
+            i = self.document(i)
+        while self.has_text(i):
+            self.line(i, self.text(i))
+            i += 1
+        self.close_collect()
+        while self.collector.depth() > 0:
+            self.collector.end()
+        self.collector.text.line_no = max(0, min(self.end if self.end is not None else i, i - 1))
+        return self.doubts
+
+    def document(self, i:int) -> int:
+        i = self.skip_blank(i)
+        if not self.has_text(i):
+            return i
+        type = self.document_type
+        if type is None:
+            first = self.text(i).strip().lower()
+            if first.startswith('bundesgesetz'):
+                type = Collector.BG
+            elif first.startswith('verordnung'):
+                type = Collector.BV
+            elif first.startswith('gesetz'):
+                type = Collector.KG
+            else:
+                type = Collector.BG
+                self.doubt(i, "Could not determine document type, assuming " + type)
+        self.collector.text.line_no = i
+        self.collector.new_document(type)
+        self.collector.new_title()
+        end = self.scan_to(i, self.TITLE_END)
+        if end is None:
+            self.doubt(i, "No 'vom ...' line found, document title is the first block only")
+            end = self.skip_blank(self.skip_block(i))
+        self.collector.text.line_no = end
+        self.collector.end()
+        start = end
+        end = self.scan_to(start, self.PREAMBLE_END)
+        if end is None:
+            self.doubt(start, "No preamble ending in 'beschliesst:' or 'verordnet:' found")
+            return start
+        self.collector.new_content()
+        self.collector.text.line_no = end
+        self.collector.end()
+        self.end = end
+        return end
+
+    def scan_to(self, i:int, pattern:re.Pattern, limit:int = 80):
+        for j in range(i, i + limit):
+            if not self.has_text(j) or self.ABSCHNITT.match(self.text(j)) or self.ARTIKEL.match(self.text(j)):
+                return None
+            if pattern.search(self.text(j)):
+                return self.skip_blank(j + 1)
+        return None
+
+    def skip_block(self, i:int) -> int:
+        j = self.collector.text.find_line(True, i)
+        return j if j is not None else max(i, self.collector.text.length())
+
+    def skip_blank(self, i:int) -> int:
+        j = self.collector.text.find_line(False, i)
+        return j if j is not None else max(i, self.collector.text.length())
+
+    def line(self, i:int, line:str):
+        if self.is_blank(line):
+            if self.end == i:
+                self.end = i + 1
+            if self.in_noise:
+                self.after_noise = True
+            self.in_noise = False
+            self.prev_blank = True
+            return
+        kind = self.classify(i, line)
+        if kind == self.NOISE:
+            self.in_noise = True
+        elif kind == self.TEXT:
+            self.text_line(i)
+            self.after_noise = False
+        else:
+            self.in_noise = False
+            self.after_noise = False
+        self.prev_blank = False
+
+    def classify(self, i:int, line:str) -> str:
+        if self.FOOTNOTE.match(line) or self.PAGE.match(line):
+            return self.NOISE
+        match = self.ABSCHNITT.match(line)
+        if match:
+            self.abschnitt(i, int(match.group(1)), match.group(2))
+            return Collector.ABSCH
+        match = self.CHAR_ABSCHNITT.match(line)
+        if match:
+            self.char_abschnitt(i, match.group(1))
+            return Collector.ABSCH
+        match = self.ARTIKEL.match(line)
+        if match:
+            self.article(i, Collector.ART, int(match.group(1)), match.group(2), match.group(3))
+            return Collector.ART
+        match = self.PARAGRAPH.match(line)
+        if match:
+            self.article(i, Collector.PAR, int(match.group(1)), match.group(2), match.group(3))
+            return Collector.PAR
+        match = self.ABSATZ.match(line)
+        if match and self.absatz(i, int(match.group(1)), match.group(2)):
+            return Collector.ABS
+        match = self.LITERA.match(line)
+        if match and self.litera(i, match.group(1)):
+            return Collector.LIT
+        if self.in_noise:
+            return self.NOISE
+        if self.after_noise and self.prev_blank and self.HEADER.match(line) and not self.PUNCTUATED.search(line):
+            return self.NOISE
+        return self.TEXT
+
+    def text_line(self, i:int):
+        c = self.collector
+        top = c.top()
+        if top is None:
+            self.doubt(i, "Text outside of any element ignored")
+            return
+        if not c.is_collecting():
+            if top.type in [c.ART, c.PAR, c.ABS, c.LIT]:
+                self.start_collect(i, c.CONT)
+            else:
+                self.doubt(i, "Text in " + top.type + " outside of title or content ignored")
+                return
+        elif self.prev_blank and self.end == i:
+            self.blocks += 1
+            if c.cur_mode == c.TITLE and self.blocks > self.max_blocks:
+                if top.type in [c.ART, c.PAR]:
+                    self.close_collect()
+                    self.start_collect(i, c.CONT)
+                else:
+                    self.doubt(i, "Unexpected text after " + top.type + " title ignored")
+                    return
+        elif self.end < i:
+            self.doubt(i, "Text continues after footnotes or page break, lines " + str(self.end) + "-" + str(i - 1) + " included in " + top.type)
+        self.end = i + 1
+
+    def start_collect(self, i:int, mode:str, max_blocks:int = 1):
+        self.collector.text.line_no = i
+        if mode == self.collector.TITLE:
+            self.collector.new_title()
+        else:
+            self.collector.new_content()
+        self.end = i + 1
+        self.blocks = 1
+        self.max_blocks = max_blocks
+
+    def close_collect(self):
+        c = self.collector
+        if c.is_collecting():
+            if c.cur_mode == c.CONT and c.top().type == c.LIT and self.LABEL_ONLY.match(self.text(c.cur_start)):
+                if all(self.is_blank(l) for l in c.text.get_lines(c.cur_start + 1, self.end)):
+                    self.doubt(c.cur_start, "Litera " + c.top().ord + " has no text, it may be laid out elsewhere on the page")
+            c.text.line_no = self.end
+            c.end()
+
+    def pop_to(self, level:int):
+        self.close_collect()
+        while self.collector.depth() > 0 and self.LEVELS[self.collector.top().type] >= level:
+            self.collector.end()
+
+    def parent_of(self, level:int):
+        for f in reversed(self.collector.hierarchy):
+            if self.LEVELS[f.type] < level:
+                return f
+        return None
+
+    def abschnitt(self, i:int, number:int, suffix:str):
+        c = self.collector
+        self.pop_to(self.LEVELS[c.ABSCH])
+        c.text.line_no = i
+        c.new_int_abschnitt()
+        if suffix != '' or c.top().ord != number:
+            self.doubt(i, "Abschnitt labelled " + str(number) + suffix + " recorded with ordinal " + str(c.top().ord))
+        self.start_collect(i, c.TITLE)
+
+    def char_abschnitt(self, i:int, letter:str):
+        c = self.collector
+        self.pop_to(self.LEVELS[c.ABSCH])
+        c.text.line_no = i
+        c.new_char_abschnitt()
+        if c.top().ord != letter:
+            self.doubt(i, "Abschnitt labelled " + letter + " recorded with ordinal " + str(c.top().ord))
+        self.start_collect(i, c.TITLE)
+
+    def article(self, i:int, type:str, number:int, suffix:str, heading:str):
+        c = self.collector
+        self.pop_to(self.LEVELS[type])
+        parent = c.top()
+        expected = c.get_next_int_ord(type, parent.id if parent else None)
+        c.text.line_no = i
+        ord = None
+        if suffix != '':
+            ord = str(number) + suffix
+        elif number != expected and str(number).startswith(str(expected)):
+            self.doubt(i, type + " " + str(number) + " read as " + str(expected) + " followed by a footnote marker")
+        elif number != expected:
+            ord = number
+            self.doubt(i, type + " " + str(number) + " does not follow on " + str(expected - 1))
+        if type == c.ART:
+            c.new_article(ord)
+        else:
+            c.new_paragraph(ord)
+        self.start_collect(i, c.TITLE, 1 if heading.strip() != '' else 2)
+
+    def absatz(self, i:int, number:int, suffix:str) -> bool:
+        c = self.collector
+        parent = self.parent_of(self.LEVELS[c.ABS])
+        if parent is None or parent.type not in [c.ART, c.PAR]:
+            return False
+        expected = c.get_next_int_ord(c.ABS, parent.id)
+        if suffix is not None and number == expected - 1:
+            self.pop_to(self.LEVELS[c.ABS])
+            c.text.line_no = i
+            c.new_absatz(str(number) + suffix)
+        elif suffix is None and number == expected:
+            self.pop_to(self.LEVELS[c.ABS])
+            c.text.line_no = i
+            c.new_absatz()
+        else:
+            if c.is_collecting():
+                self.doubt(i, "Number " + str(number) + (suffix or '') + " does not continue Absatz " + str(expected - 1) + ", treated as text")
+            return False
+        self.start_collect(i, c.CONT)
+        return True
+
+    def litera(self, i:int, letter:str) -> bool:
+        c = self.collector
+        top = c.top()
+        if top is None or self.LEVELS[top.type] < self.LEVELS[c.ART]:
+            return False
+        expected = 'a'
+        if top.type == c.LIT:
+            expected = c.CHAR_ORD.next(top.ord)
+        if letter != expected and not (expected == 'j' and letter == 'k'):
+            if letter == 'a' and top.type == c.LIT:
+                self.doubt(i, "Nested enumeration inside Litera " + top.ord + " treated as text")
+            elif c.is_collecting():
+                self.doubt(i, "Litera " + letter + " does not follow on " + (top.ord if top.type == c.LIT else top.type) + ", treated as text")
+            return False
+        self.pop_to(self.LEVELS[c.LIT])
+        c.text.line_no = i
+        c.new_litera(letter)
+        self.start_collect(i, c.CONT)
+        return True
+
+
+def recognise(collector:Collector, document_type:str = None) -> list[Doubt]:
+    return StructureRecogniser(collector, document_type).run()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("filename required")
+        exit()
+    collector = Collector(sys.argv[1])
+    for d in recognise(collector):
+        print(d)
+    collector.serialize()
+    collector.save(collector.file_name + ".ttl")
@@ -0,0 +1,365 @@
+import argparse
+import os
+import re
+from rdflib import Literal
+from collector import Collector, Frame, Text, EX, SL
+from rdfwriter import TurtleWriter
+
+TOKEN = re.compile(r'\d+|[^\W\d_]+\.?|§|[–—-]|[,;:()]|\S')
+DATE = re.compile(r'vom\s+(\d{1,2})\.\s*([^\W\d_]+)\s+(\d{4})')
+ABBREVIATION = re.compile(r'[A-ZÄÖÜ][A-Za-zäöü]*[A-ZÄÖÜ]$')
+PARENTHESES = re.compile(r'\(([^()]*)\)')
+
+ART, ABS, LIT = 'art', 'abs', 'lit'
+KEYWORDS = {
+    'art.': ART, 'artikel': ART, 'artikeln': ART, 'art': ART, '§': ART, '§§': ART, 'paragraph': ART, 'paragraphen': ART,
+    'abs.': ABS, 'absatz': ABS, 'absätze': ABS, 'absätzen': ABS, 'absatzes': ABS,
+    'bst.': LIT, 'buchstabe': LIT, 'buchstaben': LIT, 'buchstabens': LIT, 'lit.': LIT, 'litera': LIT, 'literae': LIT, 'let.': LIT
+}
+SEPARATORS = {',', 'und', 'oder', 'sowie'}
+RANGES = {'-', '–', '—', 'bis'}
+SUFFIXES = {'bis', 'ter', 'quater', 'quinquies', 'sexies', 'septies', 'octies', 'novies', 'decies'}
+SAME_ACT = {'dieses', 'dieser'}
+MAX_RANGE = 50
+MAX_ACT_TOKENS = 12
+MAX_LOOKAHEAD = 16
+
+# stands for "the article/absatz the citing frame is in"
+CURRENT = '.'
+
+
+class Token:
+
+    __slots__ = ('value', 'key', 'start', 'end')
+
+    def __init__(self, value:str, start:int, end:int):
+        self.value = value
+        self.key = value.casefold()
+        self.start = start
+        self.end = end
+
+
+class Citation:
+
+    def __init__(self, frame:Frame, text:str, targets:list[tuple], act:str = None):
+        self.frame = frame
+        self.text = text
+        self.targets = targets
+        self.act = act
+
+    def __str__(self):
+        return self.frame.id + ": " + self.text
+
+
+class Reference:
+
+    def __init__(self, citation:Citation, path:tuple, target:Frame = None, document:str = None):
+        self.citation = citation
+        self.path = path
+        self.target = target
+        self.document = document
+
+    def __str__(self):
+        where = (self.document + ":" if self.document else "") + (self.target.id if self.target else "unresolved")
+        return "{} -> {} {}".format(self.citation.frame.id, where, self.path)
+
+
+class CitationParser:
+
+    def tokens(self, text:str) -> list[Token]:
+        return [Token(m.group(0), m.start(), m.end()) for m in TOKEN.finditer(text)]
+
+    def parse(self, frame:Frame, text:str) -> list[Citation]:
+        tokens = self.tokens(text)
+        result = []
+        i = 0
+        while i < len(tokens):
+            kind = KEYWORDS.get(tokens[i].key)
+            targets = []
+            if kind == ART:
+                targets, j = self.articles(tokens, i + 1)
+            elif kind == ABS:
+                targets, j = self.absaetze(tokens, i + 1, CURRENT)
+            elif kind == LIT:
+                targets, j = self.literae(tokens, i + 1, CURRENT, CURRENT)
+            if len(targets) == 0:
+                i += 1
+                continue
+            act, end, stop = self.act(tokens, j)
+            result.append(Citation(frame, re.sub(r'\s+', ' ', text[tokens[i].start:stop]), targets, act))
+            i = end
+        return result
+
+    def number(self, tokens:list[Token], i:int):
+        if i >= len(tokens) or not tokens[i].value.isdigit():
+            return None, i
+        value = tokens[i].value
+        i += 1
+        # glued suffixes: 29f, 2bis
+        if i < len(tokens) and tokens[i].start == tokens[i-1].end and (tokens[i].key in SUFFIXES or len(tokens[i].key.rstrip('.')) == 1 and tokens[i].key[0].isalpha()):
+            value += tokens[i].key.rstrip('.')
+            i += 1
+        return value, i
+
+    def letter(self, tokens:list[Token], i:int):
+        if i >= len(tokens):
+            return None, i
+        value = tokens[i].key.rstrip('.')
+        if len(value) in (1, 2) and Collector.CHAR_ORD.is_valid(value):
+            return value, i + 1
+        return None, i
+
+    def expand(self, first:str, last:str, next) -> list[str]:
+        result = [first]
+        while result[-1] != last and len(result) <= MAX_RANGE:
+            value = next(result[-1])
+            if value is None:
+                break
+            result.append(value)
+        return result if result[-1] == last else [first, last]
+
+    def item(self, tokens:list[Token], i:int, read, next):
+        value, j = read(tokens, i)
+        if value is None:
+            return None, i
+        if j + 1 < len(tokens) and tokens[j].key in RANGES:
+            last, k = read(tokens, j + 1)
+            if last is not None:
+                return self.expand(value, last, next), k
+        return [value], j
+
+    def separated(self, tokens:list[Token], i:int, read) -> bool:
+        return i + 1 < len(tokens) and tokens[i].key in SEPARATORS and read(tokens, i + 1)[0] is not None
+
+    def items(self, tokens:list[Token], i:int, read, next, stop):
+        values = []
+        while True:
+            value, j = self.item(tokens, i, read, next)
+            if value is None:
+                break
+            values.append((value, j))
+            i = j
+            if self.separated(tokens, i, read) and not stop(tokens, i + 1):
+                i += 1
+                continue
+            break
+        return values
+
+    def articles(self, tokens:list[Token], i:int):
+        targets = []
+        end = i
+        while True:
+            numbers, end = self.item(tokens, i, self.number, self.next_number)
+            if numbers is None:
+                break
+            sub = []
+            kind = KEYWORDS.get(tokens[end].key) if end < len(tokens) else None
+            if kind == ABS:
+                sub, end = self.absaetze(tokens, end + 1, None)
+            elif kind == LIT:
+                sub, end = self.literae(tokens, end + 1, None, None)
+            for a in numbers:
+                targets += [(a, b, c) for _, b, c in sub] if sub else [(a, None, None)]
+            if not self.separated(tokens, end, self.number):
+                break
+            i = end + 1
+        return targets, end
+
+    def followed_by_keyword(self, tokens:list[Token], i:int, kinds:list[str]) -> bool:
+        # scan the rest of the enumeration, bounded to keep the pass linear
+        for j in range(i, min(len(tokens), i + MAX_LOOKAHEAD)):
+            if KEYWORDS.get(tokens[j].key) in kinds:
+                return True
+            if not (tokens[j].value.isdigit() or tokens[j].key in SEPARATORS or tokens[j].key in RANGES or tokens[j].start == tokens[j-1].end):
+                return False
+        return False
+
+    def absaetze(self, tokens:list[Token], i:int, article:str):
+        targets = []
+        end = i
+        # "Artikel 74 Absatz 1, 78 Absatz 4": 78 starts the next article, not another absatz
+        for numbers, j in self.items(tokens, i, self.number, self.next_number, lambda t, k: self.followed_by_keyword(t, k, [ABS, ART])):
+            end = j
+            sub = []
+            if j < len(tokens) and KEYWORDS.get(tokens[j].key) == LIT:
+                sub, end = self.literae(tokens, j + 1, None, None)
+            for b in numbers:
+                targets += [(article, b, c) for _, _, c in sub] if sub else [(article, b, None)]
+        return targets, end
+
+    def literae(self, tokens:list[Token], i:int, article:str, absatz:str):
+        targets = []
+        end = i
+        for letters, j in self.items(tokens, i, self.letter, Collector.CHAR_ORD.next, lambda t, k: False):
+            end = j
+            targets += [(article, absatz, c) for c in letters]
+        return targets, end
+
+    def next_number(self, value:str) -> str:
+        return str(int(value) + 1) if value.isdigit() else None
+
+    def act(self, tokens:list[Token], i:int):
+        if i >= len(tokens):
+            return None, i, tokens[i-1].end
+        if ABBREVIATION.match(tokens[i].value) and tokens[i].key not in KEYWORDS:
+            return tokens[i].value, i + 1, tokens[i].end
+        if i + 1 < len(tokens) and tokens[i].key in SAME_ACT:
+            return None, i + 2, tokens[i+1].start + len(tokens[i+1].value.rstrip('.'))
+        if tokens[i].key not in ('des', 'der'):
+            return None, i, tokens[i-1].end
+        j = i + 1
+        words = []
+        while j < len(tokens) and j - i <= MAX_ACT_TOKENS and tokens[j].key not in (',', ';', ':', '(', ')'):
+            if tokens[j].key == 'vom':
+                date = self.date(tokens, j)
+                if date is not None:
+                    return " ".join(words + [date]), j + 5, tokens[j+4].start + 4
+            if tokens[j].value[0].isupper() or len(words) > 0 and tokens[j].key in ('über', 'zum', 'zur', 'vom', 'die', 'den', 'das'):
+                words.append(tokens[j].value.rstrip('.'))
+                if tokens[j].value.endswith('.'):
+                    j += 1
+                    break
+            elif len(words) > 0:
+                break
+            elif tokens[j].key not in ('eidgenössischen', 'kantonalen', 'schweizerischen'):
+                return None, i, tokens[i-1].end
+            j += 1
+        if len(words) == 0:
+            return None, i, tokens[i-1].end
+        while not words[-1][0].isupper():
+            words.pop()
+            j -= 1
+        return " ".join(words), j, tokens[j-1].end
+
+    def date(self, tokens:list[Token], i:int):
+        if i + 4 < len(tokens) and tokens[i+1].value.isdigit() and tokens[i+2].value == '.' and tokens[i+3].value[0].isalpha() and tokens[i+4].value.isdigit():
+            return "vom {}. {} {}".format(tokens[i+1].value, tokens[i+3].value, tokens[i+4].value[0:4])
+        return None
+
+
+class Document:
+
+    def __init__(self, name:str, collector:Collector):
+        from treeindex import TreeIndex
+        self.name = name
+        self.collector = collector
+        self.tree = TreeIndex(collector)
+
+    def keys(self) -> list[str]:
+        if self.collector.length() == 0 or self.collector.sequence[0].title is None:
+            return []
+        title = self.collector.sequence[0].title
+        keys = []
+        m = DATE.search(title)
+        if m:
+            keys.append(act_key("vom {}. {} {}".format(*m.groups())))
+        for m in PARENTHESES.finditer(title):
+            if 'stand am' not in m.group(1).lower():
+                keys += [act_key(k) for k in m.group(1).split(',') if k.strip()]
+        return keys
+
+    def resolve(self, path:tuple, origin:Frame = None) -> Frame:
+        return self.tree.resolve_path(path, origin)
+
+
+def act_key(name:str) -> str:
+    return re.sub(r'\s+', ' ', name.strip().casefold())
+
+
+class ReferenceResolver:
+
+    def __init__(self):
+        self.documents = {}
+        self.acts = {}
+        self.parser = CitationParser()
+
+    def add(self, name:str, collector:Collector) -> Document:
+        document = self.documents[name] = Document(name, collector)
+        for key in document.keys():
+            self.acts.setdefault(key, document)
+        return document
+
+    def find_act(self, act:str) -> Document:
+        m = DATE.search(act)
+        if m:
+            document = self.acts.get(act_key("vom {}. {} {}".format(*m.groups())))
+            if document is not None:
+                return document
+        for word in act.split(' '):
+            key = act_key(word)
+            for candidate in [key, key[0:-2] if key.endswith('es') else key, key[0:-1] if key.endswith('s') else key]:
+                if candidate in self.acts:
+                    return self.acts[candidate]
+        return None
+
+    def citations(self, document:Document) -> list[Citation]:
+        result = []
+        for f in document.collector.sequence:
+            if f.content is not None:
+                result += self.parser.parse(f, f.content)
+        return result
+
+    def references(self, name:str) -> list[Reference]:
+        document = self.documents[name]
+        result = []
+        for citation in self.citations(document):
+            target = document if citation.act is None else self.find_act(citation.act)
+            for path in citation.targets:
+                if target is None:
+                    result.append(Reference(citation, path))
+                else:
+                    frame = target.resolve(path, citation.frame if target is document else None)
+                    result.append(Reference(citation, path, frame, target.name if target is not document else None))
+        return result
+
+
+def reference_triples(references:list[Reference]):
+    seen = set()
+    for r in references:
+        s = EX[r.citation.frame.id]
+        if r.target is not None and (r.citation.frame.id, r.target.id) not in seen:
+            seen.add((r.citation.frame.id, r.target.id))
+            yield (s, SL.references, EX[r.target.id])
+        if (r.citation.frame.id, r.citation.text) not in seen:
+            seen.add((r.citation.frame.id, r.citation.text))
+            yield (s, SL.citation, Literal(r.citation.text, lang='de'))
+
+
+def load(state_file:str) -> Collector:
+    collector = Collector(state_file, Text.from_lines([]))
+    collector.deserialize(state_file)
+    return collector
+
+
+def state_name(state_file:str) -> str:
+    base = os.path.basename(state_file)
+    return base[0:base.rfind('.')]
+
+
+def write_references(state_files:list[str], out_dir:str = None) -> dict:
+    resolver = ReferenceResolver()
+    for state_file in state_files:
+        resolver.add(state_name(state_file), load(state_file))
+    result = {}
+    for state_file in state_files:
+        name = state_name(state_file)
+        references = resolver.references(name)
+        directory = out_dir if out_dir is not None else os.path.dirname(state_file)
+        with open(os.path.join(directory, name + '.refs.ttl'), 'w') as f:
+            TurtleWriter(f, {'': str(EX), 'sl': str(SL)}).write(reference_triples(references))
+        result[name] = references
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract cross-references between the articles of collected legal texts.")
+    parser.add_argument('states', nargs='+', help="state files (.json or .state); citations of one act are resolved against all of them")
+    parser.add_argument('-o', '--out', default=None, help="directory for the <name>.refs.ttl files (default: next to each state file)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="list every reference")
+    args = parser.parse_args()
+    for name, references in write_references(args.states, args.out).items():
+        resolved = sum(1 for r in references if r.target is not None)
+        print("{}: {} references, {} resolved".format(name, len(references), resolved))
+        if args.verbose:
+            for r in references:
+                print("   ", r, "|", r.citation.text)
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+import re
+import unicodedata
+import zlib
+from bisect import bisect_left
+from collector import Collector, Frame, Text
+
+HYPHEN = re.compile(r'(?<=[^\W\d_])-\n\s*(?!(und|oder|bis|sowie)\b)(?=[a-zäöüß])')
+TOKEN = re.compile(r'[^\W\d_]+|\d+')
+QUERY = re.compile(r'"([^"]*)"?|\(|\)|-(?=\S)|[^\s()"]+')
+OPERATORS = {'AND': 'and', 'OR': 'or', 'NOT': 'not', 'UND': 'and', 'ODER': 'or', 'NICHT': 'not'}
+
+
+def tokenise(text:str) -> list[str]:
+    if text is None:
+        return []
+    text = HYPHEN.sub('', unicodedata.normalize('NFC', text))
+    return [t.casefold() for t in TOKEN.findall(text)]
+
+
+def fingerprint(f:Frame) -> int:
+    return zlib.crc32(((f.title or '') + '\0' + (f.content or '')).encode('utf-8'))
+
+
+def index_file(state_file:str) -> str:
+    return state_file[0:state_file.rfind('.')] + '.index.json'
+
+
+class QueryError(Exception):
+
+    def __init__(self, msg:str):
+        super().__init__(msg)
+
+
+class Hit:
+
+    def __init__(self, frame:Frame, path:list[Frame]):
+        self.id = frame.id
+        self.line_no = frame.line_no
+        self.path = [f.type + (' ' + str(f.ord) if f.ord is not None else '') for f in path]
+
+    def __str__(self):
+        return "[" + str(self.line_no) + "] " + self.id + " " + " > ".join(self.path)
+
+
+class SearchIndex:
+
+    def __init__(self, collector:Collector):
+        self.collector = collector
+        self.postings = {}
+        self.fingerprints = {}
+        self.terms = {}
+        self.vocabulary = None
+        self.dirty = {}
+        self.removed = set()
+        self.stale = True
+        collector.add_observer(self)
+
+    def frame_changed(self, f:Frame):
+        self.dirty[f.id] = f
+        self.removed.discard(f.id)
+
+    def frame_removed(self, f:Frame):
+        self.dirty.pop(f.id, None)
+        self.removed.add(f.id)
+
+    def state_loaded(self):
+        self.stale = True
+
+    def sync(self):
+        if self.stale:
+            for id in list(self.fingerprints):
+                if self.collector.get(id) is None:
+                    self.remove(id)
+            for f in self.collector.sequence:
+                self.update(f)
+            self.stale = False
+        else:
+            for id in self.removed:
+                self.remove(id)
+            for f in self.dirty.values():
+                self.update(f)
+        self.dirty = {}
+        self.removed = set()
+
+    def update(self, f:Frame):
+        fp = fingerprint(f)
+        if self.fingerprints.get(f.id) == fp:
+            return
+        self.remove(f.id)
+        tokens = tokenise(f.title)
+        # leave a gap so that phrases do not run from the title into the content
+        positions = list(enumerate(tokens)) + list(enumerate(tokenise(f.content), len(tokens) + 1))
+        for position, term in positions:
+            self.postings.setdefault(term, {}).setdefault(f.id, []).append(position)
+        self.terms[f.id] = set(term for position, term in positions)
+        self.fingerprints[f.id] = fp
+        self.vocabulary = None
+
+    def remove(self, id:str):
+        for term in self.terms.pop(id, []):
+            frames = self.postings[term]
+            frames.pop(id, None)
+            if len(frames) == 0:
+                del self.postings[term]
+        self.fingerprints.pop(id, None)
+        self.vocabulary = None
+
+    def save(self, file_name:str = None):
+        self.sync()
+        file_name = file_name if file_name is not None else self.collector.file_name + '.index.json'
+        tmp = file_name + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'fingerprints': self.fingerprints, 'postings': self.postings}, f)
+        os.replace(tmp, file_name)
+
+    def load(self, file_name:str = None) -> bool:
+        file_name = file_name if file_name is not None else self.collector.file_name + '.index.json'
+        if not os.path.exists(file_name):
+            return False
+        with open(file_name, 'r') as f:
+            state = json.load(f)
+        self.postings = state['postings']
+        self.fingerprints = state['fingerprints']
+        self.terms = {}
+        for term, frames in self.postings.items():
+            for id in frames:
+                self.terms.setdefault(id, set()).add(term)
+        self.vocabulary = None
+        self.stale = True
+        return True
+
+    def parse(self, query:str):
+        tokens = [m.group(0) for m in QUERY.finditer(query)]
+        node, i = self.parse_or(tokens, 0)
+        if i < len(tokens):
+            raise QueryError("Unexpected '{}' in query".format(tokens[i]))
+        return node
+
+    def parse_or(self, tokens:list[str], i:int):
+        node, i = self.parse_and(tokens, i)
+        while i < len(tokens) and OPERATORS.get(tokens[i]) == 'or':
+            right, i = self.parse_and(tokens, i + 1)
+            node = ('or', node, right)
+        return node, i
+
+    def parse_and(self, tokens:list[str], i:int):
+        node, i = self.parse_unary(tokens, i)
+        while i < len(tokens) and tokens[i] != ')' and OPERATORS.get(tokens[i]) != 'or':
+            if OPERATORS.get(tokens[i]) == 'and':
+                i += 1
+            right, i = self.parse_unary(tokens, i)
+            node = ('and', node, right)
+        return node, i
+
+    def parse_unary(self, tokens:list[str], i:int):
+        if i >= len(tokens):
+            raise QueryError("Unexpected end of query")
+        token = tokens[i]
+        if token == '-' or OPERATORS.get(token) == 'not':
+            node, i = self.parse_unary(tokens, i + 1)
+            return ('not', node), i
+        if token == '(':
+            node, i = self.parse_or(tokens, i + 1)
+            if i >= len(tokens) or tokens[i] != ')':
+                raise QueryError("Missing ')' in query")
+            return node, i + 1
+        if token == ')' or token in OPERATORS:
+            raise QueryError("Unexpected '{}' in query".format(token))
+        if token.endswith('*') and not token.startswith('"'):
+            prefix = tokenise(token)
+            if len(prefix) != 1:
+                raise QueryError("Invalid prefix '{}'".format(token))
+            return ('prefix', prefix[0]), i + 1
+        terms = tokenise(token.strip('"'))
+        if len(terms) == 0:
+            raise QueryError("Empty term '{}' in query".format(token))
+        return ('phrase', terms) if len(terms) > 1 else ('term', terms[0]), i + 1
+
+    def evaluate(self, node) -> set:
+        op = node[0]
+        if op == 'term':
+            return set(self.postings.get(node[1], {}))
+        if op == 'prefix':
+            if self.vocabulary is None:
+                self.vocabulary = sorted(self.postings)
+            result = set()
+            for term in self.vocabulary[bisect_left(self.vocabulary, node[1]):]:
+                if not term.startswith(node[1]):
+                    break
+                result.update(self.postings[term])
+            return result
+        if op == 'phrase':
+            return self.phrase(node[1])
+        if op == 'and':
+            return self.evaluate(node[1]) & self.evaluate(node[2])
+        if op == 'or':
+            return self.evaluate(node[1]) | self.evaluate(node[2])
+        return set(self.fingerprints) - self.evaluate(node[1])
+
+    def phrase(self, terms:list[str]) -> set:
+        postings = [self.postings.get(term, {}) for term in terms]
+        candidates = set(postings[0]).intersection(*postings[1:])
+        result = set()
+        for id in candidates:
+            starts = set(postings[0][id])
+            for offset in range(1, len(terms)):
+                starts &= set(p - offset for p in postings[offset][id])
+            if starts:
+                result.add(id)
+        return result
+
+    def path(self, f:Frame) -> list[Frame]:
+        path = [f]
+        while path[0].parent is not None and self.collector.get(path[0].parent) is not None:
+            path.insert(0, self.collector.get(path[0].parent))
+        return path
+
+    def search(self, query:str) -> list[Hit]:
+        self.sync()
+        frames = [self.collector.get(id) for id in self.evaluate(self.parse(query))]
+        frames.sort(key=lambda f: (f.line_no if f.line_no is not None else -1, f.id))
+        return [Hit(f, self.path(f)) for f in frames]
+
+
+def open_index(state_file:str) -> SearchIndex:
+    collector = Collector(state_file, Text.from_lines([]))
+    collector.deserialize(state_file)
+    index = SearchIndex(collector)
+    index.load(index_file(state_file))
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the titles and contents of collected legal texts.")
+    parser.add_argument('query', help='query, e.g. \'"eidgenössische Jagdbanngebiete" OR wildschutz* -vogel\'')
+    parser.add_argument('states', nargs='+', help="state .json files; a sibling .index.json is used if present")
+    parser.add_argument('-u', '--update', action='store_true', help="write back missing or outdated indexes")
+    args = parser.parse_args()
+    total = 0
+    for state_file in args.states:
+        index = open_index(state_file)
+        try:
+            hits = index.search(args.query)
+        except QueryError as e:
+            parser.error(str(e))
+        if args.update:
+            index.save(index_file(state_file))
+        for hit in hits:
+            print(state_file, hit)
+        total += len(hits)
+    print(total, "hits")
@@ -0,0 +1,375 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+from rdflib import Graph, Dataset, URIRef, Literal, RDF
+from collector import Collector, Frame, Text, EX, SL
+from corpus import Corpus
+from references import ReferenceResolver, CURRENT, state_name
+
+# rdflib's SPARQL parser is shared and not thread-safe
+QUERY_LOCK = threading.Lock()
+CONTENT_TYPES = {'json': 'application/json; charset=utf-8', 'ttl': 'text/turtle; charset=utf-8', 'text': 'text/plain; charset=utf-8'}
+
+
+class RequestError(Exception):
+
+    def __init__(self, status:int, msg:str):
+        super().__init__(msg)
+        self.status = status
+
+
+def graph_collector(file_name:str, graph:Graph) -> Collector:
+    frames = {}
+    for s in graph.subjects(RDF.type, None):
+        if not str(s).startswith(str(EX)) or str(s)[len(EX):] in frames:
+            continue
+        id = str(s)[len(EX):]
+        f = Frame(id, type=str(graph.value(s, RDF.type))[len(SL):])
+        for name in ['parent', 'prev', 'next']:
+            value = graph.value(s, SL[name])
+            setattr(f, name, str(value)[len(EX):] if value is not None else None)
+        for name in ['title', 'content', 'ord']:
+            value = graph.value(s, SL[name])
+            setattr(f, name, value.toPython() if isinstance(value, Literal) else None)
+        frames[id] = f
+    sequence = []
+    heads = [f for f in frames.values() if f.prev is None or f.prev not in frames]
+    for f in heads:
+        while f is not None and f.id in frames:
+            sequence.append(frames.pop(f.id))
+            f = frames.get(f.next)
+    sequence += sorted(frames.values(), key=lambda f: f.id)
+    collector = Collector(file_name, Text.from_lines([]))
+    collector.restore(sequence, {'last_id': sequence[-1].id if sequence else None, 'hierarchy': [], 'text_line_no': 0, 'cur_mode': None, 'cur_start': None})
+    return collector
+
+
+class LawDocument:
+
+    def __init__(self, file_name:str):
+        self.file_name = file_name
+        self.name = state_name(file_name[0:-3] if file_name.endswith('.gz') else file_name)
+        self.stamp = self.file_stamp()
+        if file_name.endswith('.json') or file_name.endswith('.state'):
+            self.collector = Collector(file_name, Text.from_lines([]))
+            self.collector.deserialize(file_name)
+            self.graph = self.collector.build_graph()
+        else:
+            self.graph = Graph()
+            with (gzip.open(file_name, 'rb') if file_name.endswith('.gz') else open(file_name, 'rb')) as f:
+                self.graph.parse(f, format='nt' if '.nt' in file_name else 'ttl')
+            self.collector = graph_collector(file_name, self.graph)
+
+    def file_stamp(self) -> tuple:
+        try:
+            s = os.stat(self.file_name)
+            return (s.st_mtime_ns, s.st_size)
+        except FileNotFoundError:
+            return None
+
+    def changed(self) -> bool:
+        return self.file_stamp() != self.stamp
+
+    def frame(self, f:Frame) -> dict:
+        result = f.serialize()
+        result['document'] = self.name
+        result['path'] = self.path(f)
+        return result
+
+    def path(self, f:Frame) -> list[str]:
+        path = []
+        while f is not None:
+            path.insert(0, f.type + (' ' + str(f.ord) if f.ord is not None else ''))
+            f = self.collector.get(f.parent)
+        return path
+
+    def subtree(self, f:Frame, depth:int = None) -> dict:
+        result = f.serialize()
+        # explicit stack: Litera nesting is shallow but imported graphs may not be
+        stack = [(result, f, 0)]
+        while stack:
+            node, frame, level = stack.pop()
+            node['children'] = []
+            if depth is not None and level >= depth:
+                continue
+            for child in self.collector.get_children(frame.id):
+                entry = child.serialize()
+                node['children'].append(entry)
+                stack.append((entry, child, level + 1))
+        return result
+
+
+class ResultCache:
+
+    def __init__(self, size:int = 1024):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, documents:set, value):
+        with self.lock:
+            self.entries[key] = (documents, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, names:set):
+        with self.lock:
+            # None marks results that depend on every document, e.g. SPARQL over the union graph
+            for key in [key for key, (documents, value) in self.entries.items() if documents is None or documents & names]:
+                del self.entries[key]
+
+    def state(self) -> dict:
+        with self.lock:
+            return {'entries': len(self.entries), 'size': self.size, 'hits': self.hits, 'misses': self.misses}
+
+
+class Snapshot:
+
+    def __init__(self, documents:dict):
+        self.documents = documents
+        self.resolver = ReferenceResolver()
+        for name, document in documents.items():
+            self.resolver.add(name, document.collector)
+        self.dataset = None
+        self.lock = threading.Lock()
+
+    def union(self) -> Dataset:
+        with self.lock:
+            if self.dataset is None:
+                dataset = Dataset(default_union=True)
+                dataset.bind('', EX)
+                dataset.bind('sl', SL)
+                for name, document in self.documents.items():
+                    graph = dataset.graph(URIRef(Corpus.GRAPH + quote(name)))
+                    graph.addN((s, p, o, graph) for s, p, o in document.graph)
+                self.dataset = dataset
+            return self.dataset
+
+    def query(self, sparql:str):
+        dataset = self.union()
+        with QUERY_LOCK:
+            result = dataset.query(sparql)
+            if result.type in ('CONSTRUCT', 'DESCRIBE'):
+                return 'ttl', result.serialize(format='turtle')
+            return 'json', result.serialize(format='json')
+
+
+class LawServer:
+
+    def __init__(self, files:list[str], cache_size:int = 1024, check_interval:float = 1.0):
+        self.files = files
+        self.check_interval = check_interval
+        self.checked = 0
+        self.cache = ResultCache(cache_size)
+        self.lock = threading.Lock()
+        documents = {}
+        for file_name in files:
+            document = LawDocument(file_name)
+            documents[document.name] = document
+        self.snapshot = Snapshot(documents)
+
+    def refresh(self):
+        if time.monotonic() - self.checked < self.check_interval:
+            return
+        with self.lock:
+            if time.monotonic() - self.checked < self.check_interval:
+                return
+            documents = dict(self.snapshot.documents)
+            changed = set()
+            for name, document in self.snapshot.documents.items():
+                if not document.changed():
+                    continue
+                if document.file_stamp() is None:
+                    del documents[name]
+                    changed.add(name)
+                    continue
+                try:
+                    documents[name] = LawDocument(document.file_name)
+                    changed.add(name)
+                except Exception as e:
+                    # most likely caught half-written: keep serving the previous version and retry at the next check
+                    print("Could not reload {}: {}".format(document.file_name, e), file=sys.stderr)
+            if changed:
+                self.snapshot = Snapshot(documents)
+                self.cache.invalidate(changed)
+            self.checked = time.monotonic()
+
+    def cached(self, key:tuple, documents:set, snapshot:Snapshot, compute):
+        result = self.cache.get(key)
+        if result is None:
+            result = compute()
+            # a reload may have replaced the snapshot while this result was computed
+            if snapshot is self.snapshot:
+                self.cache.put(key, documents, result)
+        return result
+
+    def document(self, snapshot:Snapshot, name:str) -> LawDocument:
+        document = snapshot.documents.get(name)
+        if document is None:
+            raise RequestError(404, "Unknown document '{}'".format(name))
+        return document
+
+    def documents(self) -> list[dict]:
+        return [{'name': name, 'file': d.file_name, 'frames': d.collector.length(), 'triples': len(d.graph), 'graph': Corpus.GRAPH + quote(name)}
+                for name, d in self.snapshot.documents.items()]
+
+    def sparql(self, query:str, format:str = None):
+        if query is None or query.strip() == '':
+            raise RequestError(400, "Missing query")
+        snapshot = self.snapshot
+        def compute():
+            try:
+                return snapshot.query(query)
+            except Exception as e:
+                raise RequestError(400, "Invalid query: " + str(e))
+        return self.cached(('sparql', query), None, snapshot, compute)
+
+    def cite(self, citation:str, name:str = None) -> list[dict]:
+        if citation is None or citation.strip() == '':
+            raise RequestError(400, "Missing citation")
+        snapshot = self.snapshot
+        resolver = snapshot.resolver
+        def compute():
+            citations = resolver.parser.parse(None, citation)
+            if len(citations) == 0:
+                raise RequestError(400, "No citation recognised in '{}'".format(citation))
+            result = []
+            for c in citations:
+                if name is not None:
+                    document = self.document(snapshot, name)
+                elif c.act is not None:
+                    found = resolver.find_act(c.act)
+                    document = snapshot.documents.get(found.name) if found is not None else None
+                elif len(snapshot.documents) == 1:
+                    document = next(iter(snapshot.documents.values()))
+                else:
+                    raise RequestError(400, "Name the act in the citation or pass doc=")
+                if document is None:
+                    raise RequestError(404, "Unknown act '{}'".format(c.act))
+                for path in c.targets:
+                    if CURRENT in path:
+                        raise RequestError(400, "Relative citation '{}' needs an article".format(c.text))
+                    f = resolver.documents[document.name].resolve(path)
+                    if f is not None:
+                        result.append(document.frame(f))
+            return 'json', json.dumps(result, ensure_ascii=False)
+        return self.cached(('cite', citation, name), None if name is None else {name}, snapshot, compute)
+
+    def frame(self, name:str, id:str, depth:int = None):
+        snapshot = self.snapshot
+        def compute():
+            document = self.document(snapshot, name)
+            f = document.collector.get(id)
+            if f is None:
+                raise RequestError(404, "Unknown frame '{}' in {}".format(id, name))
+            if depth == 0:
+                return 'json', json.dumps(document.frame(f), ensure_ascii=False)
+            return 'json', json.dumps(document.subtree(f, depth), ensure_ascii=False)
+        return self.cached(('frame', name, id, depth), {name}, snapshot, compute)
+
+    def handle(self, method:str, path:str, query:dict, body:bytes = None):
+        self.refresh()
+        parts = [unquote(p) for p in path.strip('/').split('/')]
+        param = lambda key: query.get(key, [None])[0]
+        if parts == ['documents']:
+            return 'json', json.dumps(self.documents(), ensure_ascii=False)
+        if parts == ['cache']:
+            return 'json', json.dumps(self.cache.state())
+        if parts == ['sparql']:
+            text = param('query')
+            if method == 'POST' and text is None and body:
+                text = body.decode('utf-8')
+            return self.sparql(text)
+        if parts == ['cite']:
+            return self.cite(param('q'), param('doc'))
+        if len(parts) == 3 and parts[0] in ('frame', 'subtree'):
+            depth = param('depth')
+            if depth is not None and not depth.isdigit():
+                raise RequestError(400, "depth must be a number")
+            return self.frame(parts[1], parts[2], 0 if parts[0] == 'frame' else (int(depth) if depth is not None else None))
+        raise RequestError(404, "Unknown endpoint /" + "/".join(parts))
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    server_version = 'semanticlaw'
+    law = None
+    quiet = False
+
+    def respond(self, method:str):
+        url = urlsplit(self.path)
+        body = None
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+            if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+                url = url._replace(query=body.decode('utf-8'))
+                body = None
+        try:
+            kind, result = self.law.handle(method, url.path, parse_qs(url.query), body)
+            status = 200
+        except RequestError as e:
+            kind, result, status = 'json', json.dumps({'error': str(e)}), e.status
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, self.path, e)
+            kind, result, status = 'json', json.dumps({'error': "Internal error: " + str(e)}), 500
+        data = result.encode('utf-8') if isinstance(result, str) else result
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPES[kind])
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.respond('GET')
+
+    def do_POST(self):
+        self.respond('POST')
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def serve(law:LawServer, host:str = 'localhost', port:int = 8642, quiet:bool = False) -> ThreadingHTTPServer:
+    handler = type('LawHandler', (Handler,), {'law': law, 'quiet': quiet})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve collected legal texts read-only over HTTP: /sparql, /cite, /frame, /subtree, /documents.")
+    parser.add_argument('files', nargs='+', help="state files (.json/.state) or graphs (.ttl/.nt, optionally .gz)")
+    parser.add_argument('-H', '--host', default='localhost', help="interface to bind (default: localhost)")
+    parser.add_argument('-p', '--port', type=int, default=8642, help="port (default: 8642)")
+    parser.add_argument('-c', '--cache', type=int, default=1024, help="number of query results to keep")
+    parser.add_argument('-i', '--interval', type=float, default=1.0, help="seconds between checks for changed files")
+    parser.add_argument('-q', '--quiet', action='store_true', help="do not log requests")
+    args = parser.parse_args()
+    law = LawServer(args.files, args.cache, args.interval)
+    httpd = serve(law, args.host, args.port, args.quiet)
+    print("Serving", len(law.snapshot.documents), "documents on http://{}:{}/".format(*httpd.server_address[0:2]))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    httpd.server_close()
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import re
+import time
+from collector import Collector, Text, StructureError
+from history import History
+from recogniser import recognise
+
+VERSION = 1
+EXTENSION = '.session'
+ANCHOR = 40
+WINDOW = 200
+SPACE = re.compile(r'\s+')
+
+RECORDED = ['new', 'title', 'content', 'end', 'cancel', 'auto', 'undo', 'redo', 'next', 'block', 'goto', 'find', 'skip', 'cite', 'review']
+# navigation is not replayed: every command carries the line it was issued on
+NAVIGATION = ['next', 'block', 'goto', 'find', 'skip', 'cite', 'review']
+# undo and redo work on the steps of the history, they do not start one
+HISTORY = ['undo', 'redo']
+
+
+def anchor(text:str) -> str:
+    return SPACE.sub(' ', text).strip()[0:ANCHOR]
+
+
+class Recorder:
+
+    def __init__(self, file_name:str, collector:Collector):
+        self.file_name = file_name
+        self.collector = collector
+        self.commands = 0
+        new = not os.path.exists(file_name) or os.path.getsize(file_name) == 0
+        self.out = open(file_name, 'a')
+        if new:
+            self.write({'version': VERSION, 'source': collector.text.pdf_filename, 'lines': collector.text.length()})
+
+    def write(self, record):
+        self.out.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.out.flush()
+
+    def record(self, command:str, args:str):
+        if command not in RECORDED:
+            return
+        text = self.collector.text
+        line_no = text.line_no
+        self.write([command, args, line_no, anchor(text.line(line_no)) if text.has_line(line_no) else ''])
+        self.commands += 1
+
+    def close(self):
+        self.out.close()
+
+
+def read_session(file_name:str) -> tuple:
+    with open(file_name, 'r') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != VERSION:
+            raise ValueError("Unsupported session version {}".format(header.get('version')))
+        return header, [json.loads(line) for line in f if line.strip() != '']
+
+
+class Replay:
+
+    def __init__(self, collector:Collector, window:int = WINDOW):
+        self.collector = collector
+        self.window = window
+        self.history = History(collector)
+        self.offset = 0
+        self.anchors = {}
+        self.replayed = 0
+        self.moved = 0
+        self.lost = []
+        self.errors = []
+
+    def matches(self, line_no:int, expected:str) -> bool:
+        text = self.collector.text
+        if not text.has_line(line_no):
+            return False
+        key = self.anchors.get(line_no)
+        if key is None:
+            key = self.anchors[line_no] = anchor(text.line(line_no))
+        return key == expected
+
+    def locate(self, line_no:int, expected:str) -> int:
+        target = line_no + self.offset
+        # a blank line says nothing about where the text went, keep the current offset
+        if expected == '' or self.matches(target, expected):
+            return max(0, min(target, self.collector.text.length() - 1))
+        # nearest matching line, alternating below and above
+        for distance in range(1, self.window + 1):
+            for candidate in (target + distance, target - distance):
+                if candidate >= 0 and self.matches(candidate, expected):
+                    self.offset = candidate - line_no
+                    self.moved += 1
+                    return candidate
+        self.lost.append((line_no, expected))
+        return max(0, min(target, self.collector.text.length() - 1))
+
+    def execute(self, command:str, args:str):
+        c = self.collector
+        if command == 'new':
+            if not c.new(args):
+                raise StructureError("Unknown type: " + args)
+        elif command == 'title':
+            c.new_title()
+        elif command == 'content':
+            c.new_content()
+        elif command == 'end':
+            c.end_scope()
+        elif command == 'cancel':
+            c.cancel()
+        elif command == 'auto':
+            for d in recognise(c, args if args in c.TYPES else None):
+                self.errors.append(str(d))
+        elif command == 'undo':
+            self.history.undo(int(args) if args.strip().isdigit() else 1)
+        elif command == 'redo':
+            self.history.redo(int(args) if args.strip().isdigit() else 1)
+
+    def run(self, records:list):
+        text = self.collector.text
+        for command, args, line_no, expected in records:
+            text.line_no = self.locate(line_no, expected)
+            # the line a command was issued on completes the step of the command before it,
+            # so navigation yields the same history steps as in the REPL
+            self.history.commit()
+            if command not in HISTORY:
+                self.history.begin((command + ' ' + args).strip())
+            if command in NAVIGATION:
+                continue
+            try:
+                self.execute(command, args)
+            except Exception as e:
+                self.errors.append("[{}] {} {}: {}".format(line_no, command, args, e))
+            self.replayed += 1
+        self.history.commit()
+
+
+def replay(session_file:str, pdf_filename:str, out:str = None, window:int = WINDOW, text:Text = None) -> Replay:
+    header, records = read_session(session_file)
+    collector = Collector(pdf_filename, text)
+    r = Replay(collector, window)
+    r.run(records)
+    base = out if out is not None else collector.file_name
+    collector.serialize(base + '.json')
+    collector.save(base + '.ttl')
+    return r
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded collection session against a (possibly re-flowed) PDF without the REPL.")
+    parser.add_argument('session', help="session log written by 'record' or collector.py --record")
+    parser.add_argument('pdf', help="PDF to collect")
+    parser.add_argument('-o', '--out', default=None, help="base name for the .json/.ttl output (default: next to the PDF)")
+    parser.add_argument('-w', '--window', type=int, default=WINDOW, help="how many lines to search in each direction when an anchor moved")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    r = replay(args.session, args.pdf, args.out, args.window)
+    for line_no, expected in r.lost:
+        print("anchor lost at line", line_no, repr(expected))
+    for e in r.errors:
+        print(e)
+    print("{} commands replayed, {} re-anchored, {} anchors lost, {} errors, {} frames in {:.2f}s".format(
+        r.replayed, r.moved, len(r.lost), len(r.errors), r.collector.length(), time.perf_counter() - start))
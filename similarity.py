@@ -0,0 +1,223 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import time
+from collector import Collector, Frame, SL, EX
+from rdfwriter import TurtleWriter
+from references import load, state_name
+from search import tokenise
+
+VERSION = 2
+EXTENSION = '.minhash.json'
+SHINGLE = 3
+PERMUTATIONS = 128
+BANDS = 16
+THRESHOLD = 0.8
+MIN_TOKENS = 8
+SEED = 1
+PRIME = (1 << 61) - 1
+# articles and paragraphs are compared with each other, Absätze only with Absätze
+LEVELS = {Collector.ART: 'article', Collector.PAR: 'article', Collector.ABS: 'absatz'}
+
+
+def signature_file(state_file:str) -> str:
+    return state_file[0:state_file.rfind('.')] + EXTENSION
+
+
+def stamp(file_name:str) -> list:
+    s = os.stat(file_name)
+    return [s.st_mtime_ns, s.st_size]
+
+
+def frame_text(collector:Collector, f:Frame) -> str:
+    parts = [f.content] + [frame_text(collector, c) for c in collector.get_children(f.id)]
+    return ' '.join(p for p in parts if p)
+
+
+def shingles(tokens:list[str]) -> set[int]:
+    return set(int.from_bytes(hashlib.blake2b(' '.join(tokens[i:i + SHINGLE]).encode('utf-8'), digest_size=8).digest(), 'big')
+               for i in range(max(1, len(tokens) - SHINGLE + 1)))
+
+
+class MinHash:
+
+    def __init__(self, permutations:int = PERMUTATIONS, seed:int = SEED):
+        self.permutations = permutations
+        self.seed = seed
+        rnd = random.Random(seed)
+        self.params = [(rnd.randrange(1, PRIME), rnd.randrange(0, PRIME)) for i in range(permutations)]
+
+    def signature(self, values:set[int]) -> list[int]:
+        return [min((a * x + b) % PRIME for x in values) for a, b in self.params]
+
+    def settings(self) -> dict:
+        return {'version': VERSION, 'shingle': SHINGLE, 'permutations': self.permutations, 'seed': self.seed, 'min_tokens': MIN_TOKENS}
+
+
+class Signatures:
+
+    def __init__(self, state_file:str, minhash:MinHash):
+        self.state_file = state_file
+        self.name = state_name(state_file)
+        self.minhash = minhash
+        self.stamp = None
+        # id -> [type, ord, fingerprint, signature, shingles]
+        self.frames = {}
+        self.hashed = 0
+
+    def load(self, file_name:str = None) -> bool:
+        file_name = file_name if file_name is not None else signature_file(self.state_file)
+        if not os.path.exists(file_name):
+            return False
+        with open(file_name, 'r') as f:
+            state = json.load(f)
+        if state['settings'] != self.minhash.settings():
+            return False
+        self.stamp = state['stamp']
+        self.frames = state['frames']
+        return True
+
+    def save(self, file_name:str = None):
+        file_name = file_name if file_name is not None else signature_file(self.state_file)
+        tmp = file_name + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'settings': self.minhash.settings(), 'stamp': self.stamp, 'frames': self.frames}, f)
+        os.replace(tmp, file_name)
+
+    def update(self) -> bool:
+        current = stamp(self.state_file)
+        if current == self.stamp:
+            return False
+        collector = load(self.state_file)
+        frames = {}
+        for f in collector.sequence:
+            if f.type not in LEVELS:
+                continue
+            tokens = tokenise(frame_text(collector, f))
+            if len(tokens) < MIN_TOKENS:
+                continue
+            fp = hashlib.blake2b(' '.join(tokens).encode('utf-8'), digest_size=8).hexdigest()
+            known = self.frames.get(f.id)
+            if known is not None and known[2] == fp:
+                frames[f.id] = [f.type, f.ord, fp, known[3], known[4]]
+            else:
+                values = shingles(tokens)
+                frames[f.id] = [f.type, f.ord, fp, self.minhash.signature(values), sorted(values)]
+                self.hashed += 1
+        self.frames = frames
+        self.stamp = current
+        return True
+
+
+class Match:
+
+    def __init__(self, score:float, a:tuple, b:tuple):
+        self.score = score
+        self.a = a
+        self.b = b
+
+    def __str__(self):
+        return "{:.3f} {}:{} <-> {}:{}".format(self.score, self.a[0], self.a[1], self.b[0], self.b[1])
+
+
+class LSHIndex:
+
+    def __init__(self, permutations:int = PERMUTATIONS, bands:int = BANDS):
+        if permutations % bands != 0:
+            raise ValueError("{} permutations cannot be split into {} bands".format(permutations, bands))
+        self.bands = bands
+        self.rows = permutations // bands
+        self.buckets = {}
+        self.signatures = {}
+        self.shingles = {}
+
+    def add(self, signatures:Signatures):
+        for id, (type, ord, fp, signature, values) in signatures.frames.items():
+            key = (signatures.name, id)
+            self.signatures[key] = signature
+            self.shingles[key] = values
+            for band in range(self.bands):
+                bucket = (LEVELS[type], band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+                self.buckets.setdefault(bucket, []).append(key)
+
+    def candidates(self, same_document:bool = False) -> set[tuple]:
+        result = set()
+        for keys in self.buckets.values():
+            for i in range(len(keys)):
+                for j in range(i + 1, len(keys)):
+                    if same_document or keys[i][0] != keys[j][0]:
+                        result.add((keys[i], keys[j]) if keys[i] < keys[j] else (keys[j], keys[i]))
+        return result
+
+    def similarity(self, a:tuple, b:tuple, sets:dict) -> float:
+        for key in (a, b):
+            if key not in sets:
+                sets[key] = set(self.shingles[key])
+        x = sets[a]
+        y = sets[b]
+        return len(x & y) / len(x | y)
+
+    def matches(self, threshold:float = THRESHOLD, same_document:bool = False) -> list[Match]:
+        result = []
+        sets = {}
+        # the signatures only estimate the similarity, every candidate is checked on its shingles
+        for a, b in self.candidates(same_document):
+            score = self.similarity(a, b, sets)
+            if score >= threshold:
+                result.append(Match(score, a, b))
+        result.sort(key=lambda m: (-m.score, m.a, m.b))
+        return result
+
+
+def similarity_triples(name:str, matches:list[Match]):
+    pairs = set()
+    for m in matches:
+        if m.a[0] == name:
+            pairs.add((m.a[1], m.b[1]))
+        if m.b[0] == name:
+            pairs.add((m.b[1], m.a[1]))
+    for id, other in sorted(pairs):
+        yield (EX[id], SL.similarTo, EX[other])
+
+
+def write_similarities(state_files:list[str], out_dir:str = None, threshold:float = THRESHOLD, bands:int = BANDS,
+                       same_document:bool = False, permutations:int = PERMUTATIONS) -> tuple:
+    minhash = MinHash(permutations)
+    index = LSHIndex(permutations, bands)
+    documents = []
+    for state_file in state_files:
+        signatures = Signatures(state_file, minhash)
+        signatures.load()
+        if signatures.update():
+            signatures.save()
+        index.add(signatures)
+        documents.append(signatures)
+    matches = index.matches(threshold, same_document)
+    for signatures in documents:
+        directory = out_dir if out_dir is not None else os.path.dirname(signatures.state_file)
+        with open(os.path.join(directory, signatures.name + '.similar.ttl'), 'w') as f:
+            TurtleWriter(f, {'': str(EX), 'sl': str(SL)}).write(similarity_triples(signatures.name, matches))
+    return documents, matches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-identical articles and Absätze across collected legal texts with MinHash and locality-sensitive hashing.")
+    parser.add_argument('states', nargs='+', help="state files (.json or .state); signatures are kept in a sibling " + EXTENSION)
+    parser.add_argument('-o', '--out', default=None, help="directory for the <name>.similar.ttl files (default: next to each state file)")
+    parser.add_argument('-t', '--threshold', type=float, default=THRESHOLD, help="minimum Jaccard similarity of the shingles of a match")
+    parser.add_argument('-b', '--bands', type=int, default=BANDS, help="LSH bands; more bands find less similar candidates")
+    parser.add_argument('-p', '--permutations', type=int, default=PERMUTATIONS, help="MinHash signature length (changing it rehashes everything)")
+    parser.add_argument('-a', '--all', action='store_true', help="also match frames within the same document")
+    parser.add_argument('-v', '--verbose', action='store_true', help="list every match")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    documents, matches = write_similarities(args.states, args.out, args.threshold, args.bands, args.all, args.permutations)
+    for signatures in documents:
+        count = sum(1 for m in matches if signatures.name in (m.a[0], m.b[0]))
+        print("{}: {} frames, {} hashed, {} matches".format(signatures.name, len(signatures.frames), signatures.hashed, count))
+    if args.verbose:
+        for m in matches:
+            print("   ", m)
+    print("{} matches in {:.2f}s".format(len(matches), time.perf_counter() - start))
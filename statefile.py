@@ -0,0 +1,209 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+from collector import Frame
+
+MAGIC = b'SLSTATE\x00'
+VERSION = 1
+EXTENSION = '.state'
+HEADER = struct.Struct('<8sHIIIIqIq')
+FRAME = struct.Struct('<IqIIIIBqQIQI')
+NONE = 0xFFFFFFFF
+NULL = -2**63
+ORD_STR, ORD_INT = 0, 1
+
+
+class StateFormatError(Exception):
+
+    def __init__(self, msg:str):
+        super().__init__(msg)
+
+
+class LazyFrame(Frame):
+
+    __slots__ = ('blobs', 'title_ref', 'content_ref')
+
+    def __init__(self, id:str, line_no:int, type:str, parent:str, prev:str, next:str, ord, blobs, title_ref:tuple, content_ref:tuple):
+        self.id = id
+        self.line_no = line_no
+        self.type = type
+        self.parent = parent
+        self.prev = prev
+        self.next = next
+        self.ord = ord
+        self.blobs = blobs
+        self.title_ref = title_ref
+        self.content_ref = content_ref
+        if title_ref is None:
+            Frame.title.__set__(self, None)
+        if content_ref is None:
+            Frame.content.__set__(self, None)
+
+    @property
+    def title(self):
+        if self.title_ref is not None:
+            Frame.title.__set__(self, self.blobs.text(*self.title_ref))
+            self.title_ref = None
+        return Frame.title.__get__(self)
+
+    @title.setter
+    def title(self, value:str):
+        Frame.title.__set__(self, value)
+        self.title_ref = None
+
+    @property
+    def content(self):
+        if self.content_ref is not None:
+            Frame.content.__set__(self, self.blobs.text(*self.content_ref))
+            self.content_ref = None
+        return Frame.content.__get__(self)
+
+    @content.setter
+    def content(self, value:str):
+        Frame.content.__set__(self, value)
+        self.content_ref = None
+
+
+def write_state(file_name:str, state:dict):
+    strings = {}
+    table = []
+    def ref(value:str) -> int:
+        if value is None:
+            return 0
+        i = strings.get(value)
+        if i is None:
+            table.append(value)
+            i = strings[value] = len(table)
+        return i
+    blobs = []
+    position = 0
+    def blob(value:str) -> tuple:
+        nonlocal position
+        if value is None:
+            return 0, NONE
+        data = value.encode('utf-8')
+        blobs.append(data)
+        position += len(data)
+        return position - len(data), len(data)
+    records = []
+    for f in state['sequence']:
+        ord = f['ord']
+        if type(ord) == int:
+            ord_kind, ord_value = ORD_INT, ord
+        else:
+            ord_kind, ord_value = ORD_STR, ref(ord)
+        records.append(FRAME.pack(
+            ref(f['id']), NULL if f['line_no'] is None else f['line_no'], ref(f['type']),
+            ref(f['parent']), ref(f['prev']), ref(f['next']), ord_kind, ord_value,
+            *blob(f['title']), *blob(f['content'])))
+    hierarchy = [ref(id) for id in state['hierarchy']]
+    last_id = ref(state['last_id'])
+    cur_mode = ref(state['cur_mode'])
+    header = HEADER.pack(
+        MAGIC, VERSION, len(table), len(records), len(hierarchy), last_id,
+        NULL if state['text_line_no'] is None else state['text_line_no'], cur_mode,
+        NULL if state['cur_start'] is None else state['cur_start'])
+    encoded = [s.encode('utf-8') for s in table]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    tmp = file_name + '.tmp'
+    with open(tmp, 'wb') as out:
+        out.write(header)
+        out.write(struct.pack('<' + str(len(offsets)) + 'Q', *offsets))
+        out.writelines(encoded)
+        out.writelines(records)
+        out.write(struct.pack('<' + str(len(hierarchy)) + 'I', *hierarchy))
+        out.writelines(blobs)
+    os.replace(tmp, file_name)
+
+
+class BinaryState:
+
+    def __init__(self, file_name:str):
+        with open(file_name, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, string_count, self.frame_count, hierarchy_count, last_id, text_line_no, cur_mode, cur_start = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise StateFormatError(file_name + " is not a state file")
+        if version != VERSION:
+            raise StateFormatError("Unsupported state file version {}".format(version))
+        position = HEADER.size
+        offsets = struct.unpack_from('<' + str(string_count + 1) + 'Q', self.data, position)
+        position += 8 * (string_count + 1)
+        table = self.data[position:position + offsets[-1]]
+        # index 0 stands for None
+        self.strings = [None] + [table[offsets[i]:offsets[i+1]].decode('utf-8') for i in range(string_count)]
+        position += offsets[-1]
+        self.frames_start = position
+        position += FRAME.size * self.frame_count
+        self.hierarchy = list(struct.unpack_from('<' + str(hierarchy_count) + 'I', self.data, position))
+        self.blobs_start = position + 4 * hierarchy_count
+        self.last_id = self.strings[last_id]
+        self.text_line_no = None if text_line_no == NULL else text_line_no
+        self.cur_mode = self.strings[cur_mode]
+        self.cur_start = None if cur_start == NULL else cur_start
+
+    def text(self, offset:int, length:int) -> str:
+        if length == NONE:
+            return None
+        start = self.blobs_start + offset
+        return self.data[start:start + length].decode('utf-8')
+
+    def records(self):
+        return FRAME.iter_unpack(self.data[self.frames_start:self.frames_start + FRAME.size * self.frame_count])
+
+    def ord(self, kind:int, value:int):
+        return value if kind == ORD_INT else self.strings[value]
+
+    def frames(self) -> list[Frame]:
+        s = self.strings
+        return [LazyFrame(s[id], None if line_no == NULL else line_no, s[type], s[parent], s[prev], s[next], ord_value if ord_kind == ORD_INT else s[ord_value],
+                          self, None if title_len == NONE else (title_offset, title_len), None if content_len == NONE else (content_offset, content_len))
+                for id, line_no, type, parent, prev, next, ord_kind, ord_value, title_offset, title_len, content_offset, content_len in self.records()]
+
+    def state(self, sequence:list = None) -> dict:
+        s = self.strings
+        if sequence is None:
+            sequence = [{
+                'id': s[id],
+                'line_no': None if line_no == NULL else line_no,
+                'type': s[type],
+                'parent': s[parent],
+                'prev': s[prev],
+                'next': s[next],
+                'ord': self.ord(ord_kind, ord_value),
+                'title': self.text(title_offset, title_len),
+                'content': self.text(content_offset, content_len)
+            } for id, line_no, type, parent, prev, next, ord_kind, ord_value, title_offset, title_len, content_offset, content_len in self.records()]
+        return {
+            'last_id': self.last_id,
+            'sequence': sequence,
+            'hierarchy': [s[i] for i in self.hierarchy],
+            'text_line_no': self.text_line_no,
+            'cur_mode': self.cur_mode,
+            'cur_start': self.cur_start
+        }
+
+
+def read_state(file_name:str) -> dict:
+    return BinaryState(file_name).state()
+
+
+def convert(source:str, target:str):
+    if source.endswith(EXTENSION):
+        with open(target, 'w') as f:
+            json.dump(read_state(source), f, indent=4)
+    else:
+        with open(source, 'r') as f:
+            write_state(target, json.load(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert collector state between the JSON and the binary " + EXTENSION + " format.")
+    parser.add_argument('source', help="state file to read (.json or " + EXTENSION + ")")
+    parser.add_argument('target', help="state file to write")
+    args = parser.parse_args()
+    convert(args.source, args.target)
@@ -0,0 +1,150 @@
+import argparse
+import json
+import random
+from collector import Collector, Frame, Text
+
+NOUNS = [
+    "Kanton", "Bundesrat", "Jagd", "Wildtier", "Schutzgebiet", "Bewilligung", "Behörde", "Jagdberechtigung",
+    "Schonzeit", "Lebensraum", "Artenvielfalt", "Wildschaden", "Landwirtschaft", "Wald", "Aufsicht",
+    "Verordnung", "Massnahme", "Bestand", "Abschuss", "Statistik", "Departement", "Gemeinde", "Eigentümer",
+    "Entschädigung", "Tierschutz", "Vogelreservat", "Wildschutzgebiet", "Jagdhund", "Hilfsmittel", "Frist"
+]
+ADJECTIVES = [
+    "kantonale", "eidgenössische", "wildlebende", "geschützte", "jagdbare", "zuständige", "angemessene",
+    "erforderliche", "einheimische", "landwirtschaftliche", "besondere", "nachhaltige", "öffentliche"
+]
+VERBS = [
+    "regeln", "bestimmen", "bezeichnen", "erteilen", "sorgen für", "überwachen", "fördern", "beschränken",
+    "erlassen", "genehmigen", "verhüten", "entschädigen", "anordnen", "festlegen"
+]
+HEADINGS = [
+    "Zweck", "Geltungsbereich", "Grundsätze", "Jagdberechtigung", "Schonzeiten", "Artenschutz",
+    "Schutzgebiete", "Wildschaden", "Aufsicht", "Vollzug", "Strafbestimmungen", "Übergangsbestimmungen",
+    "Begriffe", "Zuständigkeit", "Entschädigung", "Meldepflicht"
+]
+SECTIONS = [
+    "Allgemeine Bestimmungen", "Jagd", "Schutz", "Wildschaden", "Strafbestimmungen", "Vollzug",
+    "Schlussbestimmungen", "Organisation", "Verfahren", "Finanzierung"
+]
+
+
+class Generator:
+
+    def __init__(self, seed:int = 0, name:str = "Synthetisches Bundesgesetz"):
+        self.random = random.Random(seed)
+        self.name = name
+        self.lines = []
+        self.sequence = []
+        self.last_id = Collector.ID.increment("synthetic")
+
+    def sentence(self) -> str:
+        r = self.random
+        words = [r.choice(["Die", "Der", "Das"]), r.choice(ADJECTIVES), r.choice(NOUNS), r.choice(VERBS),
+                 "die", r.choice(ADJECTIVES), r.choice(NOUNS)]
+        if r.random() < 0.5:
+            words += ["nach", "Artikel", str(r.randint(1, 80)), "Absatz", str(r.randint(1, 6))]
+        if r.random() < 0.4:
+            words += ["und", "den", r.choice(NOUNS)]
+        return " ".join(words)
+
+    def wrap(self, text:str, width:int = 80) -> list[str]:
+        lines = []
+        line = ''
+        for word in text.split(' '):
+            if len(line) + len(word) + 1 > width and line != '' and not word[0].isdigit():
+                lines.append(line + ' ')
+                line = word
+            else:
+                line = word if line == '' else line + ' ' + word
+        lines.append(line + ' ')
+        return lines
+
+    def block(self, lines:list[str]) -> str:
+        start = len(self.lines)
+        self.lines += lines + ['']
+        return "\n".join(self.lines[start:])
+
+    def frame(self, type:str, parent:Frame, ord = None) -> Frame:
+        self.last_id = Collector.ID.increment(self.last_id)
+        f = Frame(self.last_id, line_no=len(self.lines), type=type, parent=parent.id if parent else None, ord=ord)
+        if self.sequence:
+            f.prev = self.sequence[-1].id
+            self.sequence[-1].next = f.id
+        self.sequence.append(f)
+        return f
+
+    def text(self, sentences:int) -> list[str]:
+        return self.wrap(" ".join(self.sentence() + "." for i in range(sentences)))
+
+    def generate(self, size:int) -> dict:
+        r = self.random
+        doc = self.frame(Collector.BG, None)
+        doc.title = self.block(["Bundesgesetz ", "über " + self.name + " ", "", "vom 20. Juni 1986 (Stand am 1. Januar 2022) "])
+        doc.content = self.block(["Die Bundesversammlung der Schweizerischen Eidgenossenschaft, ", "beschliesst: "])
+        article = 0
+        section = 0
+        while len(self.sequence) < size:
+            section += 1
+            absch = self.frame(Collector.ABSCH, doc, section)
+            absch.title = self.block([str(section) + ". Abschnitt: " + r.choice(SECTIONS) + " "])
+            for a in range(r.randint(3, 15)):
+                if len(self.sequence) >= size:
+                    break
+                article += 1
+                art = self.frame(Collector.ART, absch, article)
+                art.title = self.block(["Art. " + str(article) + " ", "", r.choice(HEADINGS) + " "])
+                for n in range(1, r.randint(1, 5) + 1):
+                    if len(self.sequence) >= size:
+                        break
+                    absatz = self.frame(Collector.ABS, art, n)
+                    literae = r.randint(2, 6) if r.random() < 0.3 else 0
+                    lines = self.text(r.randint(1, 3) if literae == 0 else 1)
+                    lines[0] = str(n) + " " + lines[0]
+                    if literae > 0:
+                        lines[-1] = lines[-1].rstrip(' .') + ': '
+                    absatz.content = self.block(lines)
+                    ord = ''
+                    for l in range(literae):
+                        if len(self.sequence) >= size:
+                            break
+                        ord = Collector.CHAR_ORD.next(ord)
+                        litera = self.frame(Collector.LIT, absatz, ord)
+                        lines = self.text(1)
+                        lines[0] = ord + ".  " + lines[0]
+                        litera.content = self.block(lines)
+        return {
+            'last_id': self.last_id,
+            'sequence': [f.serialize() for f in self.sequence],
+            'hierarchy': [],
+            'text_line_no': len(self.lines) - 1,
+            'cur_mode': None,
+            'cur_start': None
+        }
+
+
+def generate(size:int, seed:int = 0) -> tuple[dict, list[str]]:
+    g = Generator(seed)
+    state = g.generate(size)
+    return state, g.lines
+
+
+def generate_collector(size:int, seed:int = 0) -> Collector:
+    state, lines = generate(size, seed)
+    collector = Collector('synthetic.pdf', Text.from_lines(lines))
+    collector.load_state(state)
+    return collector
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Collector state file.")
+    parser.add_argument('frames', type=int, help="number of frames")
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-o', '--out', default='synthetic.json', help="state file to write")
+    parser.add_argument('-t', '--text', default=None, help="also write the text lines to this file")
+    args = parser.parse_args()
+    state, lines = generate(args.frames, args.seed)
+    with open(args.out, 'w') as f:
+        json.dump(state, f, indent=4)
+    if args.text is not None:
+        with open(args.text, 'w') as f:
+            f.write("\n".join(lines))
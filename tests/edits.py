@@ -0,0 +1,37 @@
+import random
+from collector import Collector
+from synthetic import generate
+
+COMMANDS = ['new Artikel', 'new Absatz', 'new Abschnitt', 'new Litera', 'title', 'content', 'next', 'next', 'next', 'end', 'cancel']
+
+
+def text(size:int = 30, seed:int = 0) -> list[str]:
+    return generate(size, seed)[1]
+
+
+def edit(collector:Collector, command:str):
+    if command.startswith('new '):
+        collector.new(command[4:])
+    elif command == 'title':
+        collector.new_title()
+    elif command == 'content':
+        collector.new_content()
+    elif command == 'next':
+        collector.next_line()
+    elif command == 'end':
+        collector.end_scope()
+    elif command == 'cancel':
+        collector.cancel()
+
+
+def commands(count:int, seed:int = 0) -> list[str]:
+    rnd = random.Random(seed)
+    return ['new ' + Collector.BG] + [rnd.choice(COMMANDS) for i in range(count)]
+
+
+def run(collector:Collector, command:str):
+    # like the REPL: a command the structure does not allow fails and the session goes on
+    try:
+        edit(collector, command)
+    except Exception:
+        pass
@@ -0,0 +1,24 @@
+from batch import add_to_corpus
+from corpus import Corpus
+from synthetic import generate_collector
+
+
+def test_corpus_failures_are_reported_and_do_not_stop_the_batch(tmp_path):
+    good = str(tmp_path / 'good.json')
+    generate_collector(50).serialize(good)
+    bad = str(tmp_path / 'bad.json')
+    with open(bad, 'w') as f:
+        f.write('{')
+    report = {'files': 3, 'failed': 1, 'results': [
+        {'file': 'bad.pdf', 'error': None, 'json': bad, 'seconds': 1.0},
+        {'file': 'broken.pdf', 'error': 'ValueError()', 'seconds': 1.0},
+        {'file': 'good.pdf', 'error': None, 'json': good, 'seconds': 1.0}
+    ]}
+    add_to_corpus(report, str(tmp_path / 'corpus.sqlite'))
+    assert report['failed'] == 2
+    assert report['results'][0]['error'].startswith('corpus: ')
+    assert report['results'][1]['error'] == 'ValueError()'
+    assert report['results'][2]['error'] is None
+    corpus = Corpus(str(tmp_path / 'corpus.sqlite'))
+    assert [d['name'] for d in corpus.documents()] == ['good']
+    corpus.close()
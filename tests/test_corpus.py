@@ -0,0 +1,31 @@
+import pytest
+from rdflib import Literal
+from collector import EX, SL
+from corpus import Corpus
+from synthetic import generate_collector
+
+
+def failing(triples):
+    yield from triples
+    raise RuntimeError("interrupted")
+
+
+def test_add_and_replace_document(tmp_path):
+    corpus = Corpus(str(tmp_path / 'corpus.sqlite'))
+    collector = generate_collector(50)
+    assert corpus.add_collector(collector, 'law') == len(collector.build_graph())
+    assert corpus.add('law', [(EX.a, SL.title, Literal('neu', lang='de'))]) == 1
+    assert [d['name'] for d in corpus.documents()] == ['law']
+    corpus.close()
+
+
+def test_failed_add_leaves_no_dangling_terms(tmp_path):
+    corpus = Corpus(str(tmp_path / 'corpus.sqlite'))
+    with pytest.raises(RuntimeError):
+        corpus.add('law', failing([(EX.a, SL.title, Literal('neu', lang='de'))]))
+    corpus.add('law', [(EX.a, SL.title, Literal('neu', lang='de'))])
+    assert list(corpus.document('law')) == [(EX.a, SL.title, Literal('neu', lang='de'))]
+    dangling = corpus.store.connection.execute(
+        "SELECT count(*) FROM quads WHERE s NOT IN (SELECT id FROM terms) OR p NOT IN (SELECT id FROM terms) OR o NOT IN (SELECT id FROM terms)").fetchone()[0]
+    assert dangling == 0
+    corpus.close()
@@ -0,0 +1,33 @@
+from collector import Collector, Text
+from diff import Change, StructuralDiff
+from recogniser import recognise
+from synthetic import generate
+
+
+def versions(seed:int = 0) -> tuple:
+    state, lines = generate(200, seed)
+    old = Collector('law.pdf', Text.from_lines(lines))
+    old.load_state(state)
+    new = Collector('neu.pdf', Text.from_lines(lines))
+    recognise(new)
+    return old, new
+
+
+def test_republished_act_is_unchanged_and_keeps_its_ids():
+    old, new = versions()
+    diff = StructuralDiff(old, new)
+    assert diff.changes == []
+    diff.carry_over()
+    assert [f.id for f in new.sequence] == [f.id for f in old.sequence]
+    assert new.state()['sequence'] == old.state()['sequence']
+
+
+def test_modified_frame():
+    old, new = versions(1)
+    f = next(f for f in new.sequence if f.type == Collector.ABS)
+    f.content += ' Vorbehalten bleibt das kantonale Recht.'
+    diff = StructuralDiff(old, new)
+    kinds = [(c.kind, c.frame().id) for c in diff.changes]
+    assert (Change.MODIFIED, f.id) in kinds
+    assert diff.summary()[Change.MODIFIED] == 1
+    assert diff.summary()[Change.REMOVED] == 0
@@ -0,0 +1,69 @@
+import json
+import pytest
+from collector import Collector, Text
+from history import History
+from treeindex import TreeIndex
+from tests.edits import text, commands, run
+
+
+def snapshot(collector:Collector) -> str:
+    return json.dumps(collector.state(), sort_keys=True)
+
+
+def edited(seed:int, count:int = 150) -> tuple:
+    collector = Collector('law.pdf', Text.from_lines(text(seed=seed)))
+    history = History(collector)
+    states = [snapshot(collector)]
+    for command in commands(count, seed):
+        history.begin(command)
+        run(collector, command)
+        if history.commit() is not None:
+            states.append(snapshot(collector))
+    return collector, history, states
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_every_undo_restores_the_previous_state(seed):
+    collector, history, states = edited(seed)
+    assert len(history.undo_steps) == len(states) - 1
+    for state in reversed(states[0:-1]):
+        assert history.undo() == 1
+        assert snapshot(collector) == state
+    assert history.undo() == 0
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_undo_then_redo_is_the_identity(seed):
+    collector, history, states = edited(seed)
+    count = len(history.undo_steps)
+    assert history.undo(count // 2) == count // 2
+    assert snapshot(collector) == states[count - count // 2]
+    assert history.redo(count) == count // 2
+    assert snapshot(collector) == states[-1]
+
+
+def test_new_edit_clears_redo():
+    collector, history, states = edited(0)
+    history.undo(3)
+    history.begin('next')
+    collector.next_line()
+    history.commit()
+    assert history.redo_steps == []
+    assert history.redo() == 0
+
+
+def test_observers_follow_undo_and_redo():
+    collector, history, states = edited(1)
+    tree = TreeIndex(collector)
+    tree.sync()
+    history.undo(10)
+    history.redo(4)
+    assert [tree.entry(f).pre for f in collector.sequence] == list(range(collector.length()))
+    rebuilt = TreeIndex(collector)
+    assert all(tree.entry(f).end == rebuilt.entry(f).end for f in collector.sequence)
+
+
+def test_loading_a_state_clears_history():
+    collector, history, states = edited(2)
+    collector.load_state(json.loads(states[0]))
+    assert history.undo() == 0
@@ -0,0 +1,36 @@
+import time
+from collector import Collector
+from instrumentation import Instrumentation
+from synthetic import generate_collector
+
+
+def test_generator_timing_covers_the_whole_iteration():
+    instrumentation = Instrumentation()
+
+    def produce():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+
+    produce = instrumentation.timed('produce', produce)
+    items = produce()
+    assert instrumentation.metrics.samples == {}
+    for item in items:
+        time.sleep(0.05)
+    seconds = instrumentation.metrics.samples['produce']
+    assert len(seconds) == 1
+    assert 0.03 <= seconds[0] < 0.15
+
+
+def test_only_commands_are_timed():
+    collector = generate_collector(50)
+    instrumentation = Instrumentation()
+    collector.instrument(instrumentation)
+    assert len(list(collector.triples())) == len(collector.build_graph())
+    collector.get_line()
+    summary = instrumentation.metrics.summary()
+    assert summary['Collector.triples']['count'] == 2
+    assert summary['Collector.build_graph']['count'] == 1
+    assert not any(name.startswith('Collector.get_') for name in summary)
+    instrumentation.unwrap()
+    assert not any(name in vars(collector) for name in Collector.COMMANDS)
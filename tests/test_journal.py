@@ -0,0 +1,48 @@
+import pytest
+from collector import Collector, Text
+from journal import Journal
+from tests.edits import text, commands, run
+
+
+def session(base_name:str, lines:list[str], count:int, seed:int, compact_every:int = Journal.COMPACT_EVERY) -> Collector:
+    collector = Collector('law.pdf', Text.from_lines(lines))
+    journal = Journal(collector, base_name, compact_every)
+    for command in commands(count, seed):
+        run(collector, command)
+        journal.checkpoint()
+    return collector
+
+
+def restored(base_name:str, lines:list[str]) -> tuple:
+    collector = Collector('law.pdf', Text.from_lines(lines))
+    count = Journal(collector, base_name).restore()
+    return collector, count
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_replay_equals_live_state(tmp_path, seed):
+    lines = text(seed=seed)
+    live = session(str(tmp_path / 'law'), lines, 150, seed)
+    collector, count = restored(str(tmp_path / 'law'), lines)
+    assert count > 0
+    assert collector.state() == live.state()
+
+
+def test_replay_after_compaction(tmp_path):
+    lines = text()
+    live = session(str(tmp_path / 'law'), lines, 150, 3, compact_every=7)
+    collector, count = restored(str(tmp_path / 'law'), lines)
+    assert count < 7
+    assert collector.state() == live.state()
+
+
+def test_torn_last_entry_is_ignored(tmp_path):
+    lines = text()
+    base_name = str(tmp_path / 'law')
+    session(base_name, lines, 40, 4)
+    expected, count = restored(base_name, lines)
+    with open(base_name + '.journal', 'ab') as f:
+        f.write(b'{"removed": [], "fra')
+    collector, torn = restored(base_name, lines)
+    assert torn == count
+    assert collector.state() == expected.state()
@@ -0,0 +1,29 @@
+import gzip
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+from synthetic import generate_collector
+
+
+def parse(file_name:str) -> Graph:
+    graph = Graph()
+    with (gzip.open(file_name, 'rb') if file_name.endswith('.gz') else open(file_name, 'rb')) as f:
+        graph.parse(f, format='nt' if '.nt' in file_name else 'turtle')
+    return graph
+
+
+@pytest.mark.parametrize('name', ['law.ttl', 'law.nt', 'law.ttl.gz', 'law.nt.gz'])
+def test_streamed_output_is_isomorphic_to_build_graph(tmp_path, name):
+    collector = generate_collector(200)
+    collector.save(str(tmp_path / name))
+    assert isomorphic(parse(str(tmp_path / name)), collector.build_graph())
+
+
+@pytest.mark.parametrize('name', ['law.ttl', 'law.nt'])
+def test_literals_are_escaped(tmp_path, name):
+    collector = generate_collector(20)
+    f = collector.sequence[3]
+    f.title = 'Art. 1 "Zweck" \\ Übersicht\nzweite Zeile\r'
+    f.content = "Tab\tund 'Apostroph'"
+    collector.save(str(tmp_path / name))
+    assert isomorphic(parse(str(tmp_path / name)), collector.build_graph())
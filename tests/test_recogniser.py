@@ -0,0 +1,27 @@
+import pytest
+from collector import Collector, Text
+from recogniser import recognise
+from synthetic import generate
+
+
+def shape(collector:Collector) -> list[tuple]:
+    position = {f.id: i for i, f in enumerate(collector.sequence)}
+    return [(f.type, f.ord, f.title, f.content, f.line_no, position.get(f.parent)) for f in collector.sequence]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_recognises_synthetic_law(seed):
+    state, lines = generate(300, seed)
+    truth = Collector('synthetic.pdf', Text.from_lines(lines))
+    truth.load_state(state)
+    collector = Collector('synthetic.pdf', Text.from_lines(lines))
+    assert recognise(collector) == []
+    assert shape(collector) == shape(truth)
+
+
+def test_leaves_no_scope_open():
+    state, lines = generate(50)
+    collector = Collector('synthetic.pdf', Text.from_lines(lines))
+    recognise(collector)
+    assert collector.depth() == 0
+    assert not collector.is_collecting()
@@ -0,0 +1,22 @@
+import pytest
+from references import CitationParser
+
+
+@pytest.mark.parametrize('citation, targets', [
+    ('Art. 5 Abs. 2 Bst. a', [('5', '2', 'a')]),
+    ('Artikel 3, 4 und 7', [('3', None, None), ('4', None, None), ('7', None, None)]),
+    ('Art. 12 Abs. 1 des Bundesgesetzes vom 20. Juni 1986', [('12', '1', None)]),
+])
+def test_targets(citation, targets):
+    citations = CitationParser().parse(None, citation)
+    assert [t for c in citations for t in c.targets] == targets
+
+
+def test_act_is_recognised():
+    citations = CitationParser().parse(None, 'gemäss Art. 12 Abs. 1 des Bundesgesetzes vom 20. Juni 1986 über die Jagd')
+    assert len(citations) == 1
+    assert citations[0].act is not None
+
+
+def test_text_without_citation():
+    assert CitationParser().parse(None, 'Die Kantone regeln die Jagd.') == []
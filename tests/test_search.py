@@ -0,0 +1,37 @@
+import pytest
+from search import QueryError, SearchIndex, index_file, tokenise
+from synthetic import generate_collector
+
+
+def test_index_file_strips_the_extension():
+    assert index_file('acts/law.json') == 'acts/law.index.json'
+    assert index_file('acts/law.state') == 'acts/law.index.json'
+    assert index_file('acts.v2/law.json') == 'acts.v2/law.index.json'
+
+
+@pytest.mark.parametrize('query', ['a AND (', '(jagd', 'OR', '"'])
+def test_malformed_query_raises_query_error(query):
+    index = SearchIndex(generate_collector(30))
+    with pytest.raises(QueryError):
+        index.search(query)
+
+
+def test_hits_contain_all_terms():
+    collector = generate_collector(200)
+    index = SearchIndex(collector)
+    hits = index.search('kanton AND bewilligung')
+    assert len(hits) > 0
+    for hit in hits:
+        f = collector.get(hit.id)
+        terms = set(tokenise(f.title) + tokenise(f.content))
+        assert {'kanton', 'bewilligung'} <= terms
+
+
+def test_saved_index_is_reused(tmp_path):
+    collector = generate_collector(100)
+    index = SearchIndex(collector)
+    expected = [h.id for h in index.search('jagd OR wald')]
+    index.save(str(tmp_path / 'law.index.json'))
+    loaded = SearchIndex(collector)
+    assert loaded.load(str(tmp_path / 'law.index.json'))
+    assert [h.id for h in loaded.search('jagd OR wald')] == expected
@@ -0,0 +1,67 @@
+import json
+import shutil
+import threading
+from urllib.error import HTTPError
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+import pytest
+from server import LawServer, serve
+from synthetic import generate_collector
+
+
+@pytest.fixture
+def running(tmp_path):
+    generate_collector(200).serialize(str(tmp_path / 'law.json'))
+    law = LawServer([str(tmp_path / 'law.json')], check_interval=0)
+    httpd = serve(law, port=0, quiet=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield law, 'http://localhost:{}'.format(httpd.server_address[1]), tmp_path
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(url:str) -> tuple:
+    try:
+        with urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_documents_frame_and_sparql(running):
+    law, base, tmp_path = running
+    status, documents = get(base + '/documents')
+    assert status == 200 and documents[0]['name'] == 'law'
+    f = law.snapshot.documents['law'].collector.sequence[1]
+    status, frame = get(base + '/frame/law/' + quote(f.id))
+    assert status == 200 and frame['id'] == f.id
+    status, result = get(base + '/sparql?' + urlencode({'query': 'SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }'}))
+    assert status == 200 and int(result['results']['bindings'][0]['n']['value']) == documents[0]['triples']
+
+
+def test_request_errors(running):
+    law, base, tmp_path = running
+    assert get(base + '/frame/unknown/x')[0] == 404
+    assert get(base + '/sparql?' + urlencode({'query': 'SELECT WHERE'}))[0] == 400
+
+
+def test_unexpected_error_is_answered_with_500(running, monkeypatch):
+    law, base, tmp_path = running
+    def fail(*args):
+        raise ValueError("boom")
+    monkeypatch.setattr(law, 'handle', fail)
+    status, body = get(base + '/documents')
+    assert status == 500 and 'boom' in body['error']
+
+
+def test_half_written_file_keeps_previous_version(running):
+    law, base, tmp_path = running
+    frames = get(base + '/documents')[1][0]['frames']
+    with open(tmp_path / 'law.json') as f:
+        data = f.read()
+    with open(tmp_path / 'law.json', 'w') as f:
+        f.write(data[0:len(data) // 2])
+    status, documents = get(base + '/documents')
+    assert status == 200 and documents[0]['frames'] == frames
+    generate_collector(100).serialize(str(tmp_path / 'law.json'))
+    assert get(base + '/documents')[1][0]['frames'] == 100
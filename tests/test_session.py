@@ -0,0 +1,43 @@
+import random
+import pytest
+from collector import Collector, CommandlineCollector, Text
+from session import Replay, anchor, replay
+from tests.edits import text, COMMANDS
+
+REPL = COMMANDS + ['undo', 'undo 2', 'redo', 'skip', 'block']
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_replay_with_undo_equals_live_session(tmp_path, seed):
+    lines = text(seed=seed)
+    pdf = str(tmp_path / 'law.pdf')
+    app = CommandlineCollector(pdf, Text.from_lines(lines))
+    rnd = random.Random(seed)
+    app.onecmd_plus_hooks('record ' + str(tmp_path / 'law.session'))
+    app.onecmd_plus_hooks('new ' + Collector.BG)
+    for i in range(150):
+        app.onecmd_plus_hooks(rnd.choice(REPL))
+    app.onecmd_plus_hooks('record off')
+    r = replay(str(tmp_path / 'law.session'), pdf, str(tmp_path / 'replayed'), text=Text.from_lines(lines))
+    assert r.lost == []
+    assert r.collector.state()['sequence'] == app.collector.state()['sequence']
+    assert r.collector.state()['hierarchy'] == app.collector.state()['hierarchy']
+
+
+def test_locate_follows_shifted_text():
+    lines = ['Art. 1 Zweck', 'Dieses Gesetz regelt', '', 'Art. 2 Begriffe', 'In diesem Gesetz', 'bedeutet', '', 'Art. 3']
+    shifted = ['Titel', 'Ingress'] + lines
+    r = Replay(Collector('law.pdf', Text.from_lines(shifted)))
+    assert [r.locate(i, anchor(line)) for i, line in enumerate(lines)] == list(range(2, 10))
+    assert r.lost == []
+
+
+def test_blank_anchor_keeps_offset():
+    lines = ['Art. 1 Zweck', 'Dieses Gesetz regelt', 'die Jagd', '', 'Art. 2']
+    # a blank line was inserted right before the line the command was issued on
+    reflowed = ['Art. 1 Zweck', '', 'Dieses Gesetz regelt', 'die Jagd', '', 'Art. 2']
+    r = Replay(Collector('law.pdf', Text.from_lines(reflowed)))
+    assert r.locate(2, anchor(lines[2])) == 3
+    assert r.locate(3, '') == 4
+    assert r.offset == 1
+    assert r.locate(4, anchor(lines[4])) == 5
@@ -0,0 +1,80 @@
+import json
+from rdflib import Graph
+from collector import SL
+from references import load
+from search import tokenise
+from similarity import LEVELS, MIN_TOKENS, THRESHOLD, frame_text, shingles, write_similarities
+from synthetic import generate_collector
+
+
+def jaccard(a:str, b:str) -> float:
+    x = shingles(tokenise(a))
+    y = shingles(tokenise(b))
+    return len(x & y) / len(x | y)
+
+
+def corpus(tmp_path) -> tuple:
+    original = generate_collector(300, 5)
+    original.serialize(str(tmp_path / 'bund.json'))
+    state = original.state()
+    rewritten = []
+    for i, d in enumerate(state['sequence']):
+        d['id'] = 'k' + d['id']
+        for name in ('parent', 'prev', 'next'):
+            d[name] = 'k' + d[name] if d[name] is not None else None
+        if d['type'] == 'Absatz' and d['content'] and i % 5 == 0:
+            d['content'] = 'Die Gemeinden regeln die Fischerei in den Gewässern selbst und erheben dafür Gebühren.'
+            rewritten.append(d['id'])
+    state['hierarchy'] = []
+    with open(tmp_path / 'kanton.json', 'w') as f:
+        json.dump(state, f)
+    return [str(tmp_path / 'bund.json'), str(tmp_path / 'kanton.json')], rewritten
+
+
+def test_matches_are_verified_exactly(tmp_path):
+    files, rewritten = corpus(tmp_path)
+    documents, matches = write_similarities(files)
+    collectors = {'bund': load(files[0]), 'kanton': load(files[1])}
+    assert len(matches) > 0
+    for m in matches:
+        a = collectors[m.a[0]].get(m.a[1])
+        b = collectors[m.b[0]].get(m.b[1])
+        assert m.a[0] != m.b[0]
+        assert LEVELS[a.type] == LEVELS[b.type]
+        assert m.score == jaccard(frame_text(collectors[m.a[0]], a), frame_text(collectors[m.b[0]], b)) >= THRESHOLD
+
+
+def test_copied_frames_are_linked_and_rewritten_ones_are_not(tmp_path):
+    files, rewritten = corpus(tmp_path)
+    documents, matches = write_similarities(files)
+    pairs = set((m.a[1], m.b[1]) for m in matches)
+    bund = load(files[0])
+    kanton = load(files[1])
+    copied = 0
+    for f in bund.sequence:
+        if f.type not in LEVELS or len(tokenise(frame_text(bund, f))) < MIN_TOKENS:
+            continue
+        if frame_text(bund, f) == frame_text(kanton, kanton.get('k' + f.id)):
+            assert (f.id, 'k' + f.id) in pairs
+            copied += 1
+    assert copied > 0
+    for id in rewritten:
+        assert (id[1:], id) not in pairs
+    graph = Graph().parse(str(tmp_path / 'kanton.similar.ttl'), format='turtle')
+    assert len(set(graph.subject_objects(SL.similarTo))) == sum(1 for m in matches if 'kanton' in (m.a[0], m.b[0]))
+
+
+def test_signatures_are_reused(tmp_path):
+    files, rewritten = corpus(tmp_path)
+    write_similarities(files)
+    documents, matches = write_similarities(files)
+    assert [d.hashed for d in documents] == [0, 0]
+    with open(files[1]) as f:
+        state = json.load(f)
+    changed = next(d for d in state['sequence'] if d['type'] == 'Absatz' and d['content'])
+    changed['content'] += ' Vorbehalten bleibt das Bundesrecht.'
+    with open(files[1], 'w') as f:
+        json.dump(state, f)
+    documents, again = write_similarities(files)
+    # the Absatz and the article around it
+    assert [d.hashed for d in documents] == [0, 2]
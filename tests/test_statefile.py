@@ -0,0 +1,23 @@
+import json
+from collector import Collector, Text
+from statefile import convert, read_state
+from synthetic import generate_collector
+
+
+def test_state_round_trips_through_binary_file(tmp_path):
+    collector = generate_collector(300)
+    collector.sequence[5].title = 'Überschrift mit "Zeichen" \\ und ß'
+    collector.serialize(str(tmp_path / 'law.state'))
+    loaded = Collector(str(tmp_path / 'law.state'), Text.from_lines([]))
+    loaded.deserialize(str(tmp_path / 'law.state'))
+    assert loaded.state() == collector.state()
+
+
+def test_convert_json_to_state_and_back(tmp_path):
+    collector = generate_collector(300, 1)
+    collector.serialize(str(tmp_path / 'law.json'))
+    convert(str(tmp_path / 'law.json'), str(tmp_path / 'law.state'))
+    convert(str(tmp_path / 'law.state'), str(tmp_path / 'copy.json'))
+    with open(tmp_path / 'law.json') as a, open(tmp_path / 'copy.json') as b:
+        assert json.load(a) == json.load(b)
+    assert read_state(str(tmp_path / 'law.state')) == collector.state()
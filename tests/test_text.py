@@ -0,0 +1,46 @@
+from collector import Text
+
+
+def test_lines_and_blank_index():
+    lines = ['Art. 1', '', 'Zweck', '   ', 'Text']
+    text = Text.from_lines(lines)
+    assert text.length() == len(lines)
+    assert [text.line(i) for i in range(text.length())] == lines
+    assert [text.is_blank(i) for i in range(text.length())] == [False, True, False, True, False]
+    assert text.find_line(True, 2) == 3
+    assert not text.has_line(len(lines))
+
+
+def test_pages_read_evict_the_least_recently_used():
+    text = Text(None, window=3)
+    for page in [0, 1, 2, 0, 3]:
+        text.cache(page, [str(page)])
+    assert list(text.pages) == [2, 0, 3]
+
+
+def test_pages_read_ahead_never_evict_the_pages_being_read():
+    text = Text(None, window=4)
+    for page in range(4):
+        text.cache(page, [str(page)])
+    text.current = 1
+    text.cache(10, ['10'], True)
+    assert list(text.pages) == [0, 1, 2, 3]
+    text.current = 3
+    text.cache(10, ['10'], True)
+    assert list(text.pages) == [1, 2, 3, 10]
+
+
+def test_find_line_sees_lines_appended_during_the_search():
+    text = Text(None)
+    text.add_lines(['a', 'b'], 'z')
+    text.source = iter([])
+
+    class Appending(bytearray):
+        def find(self, *args):
+            found = super().find(*args)
+            if len(text.offsets) == 1:
+                text.add_lines(['', 'c'], 'z')
+            return found
+
+    text.blank = Appending(text.blank)
+    assert text.find_line(True, 0) == 2
@@ -0,0 +1,34 @@
+from collector import Text
+from textcache import TextCache
+
+
+def test_committed_lines_are_read_back(tmp_path):
+    cache = TextCache(str(tmp_path))
+    lines = ['Bundesgesetz', '', 'über die Jagd und den Schutz', 'Art. 1 Zweck – «Übersicht»']
+    writer = cache.writer('law')
+    writer.add(lines[0:2])
+    writer.add(lines[2:])
+    writer.commit()
+    cached = cache.get('law')
+    assert len(cached) == len(lines)
+    assert [cached[i] for i in range(len(cached))] == lines
+    cached.close()
+
+
+def test_aborted_entry_is_not_visible(tmp_path):
+    cache = TextCache(str(tmp_path))
+    writer = cache.writer('law')
+    writer.add(['Art. 1'])
+    writer.abort()
+    assert cache.get('law') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stopping_a_foreground_extraction_discards_the_partial_entry(tmp_path):
+    cache = TextCache(str(tmp_path))
+    text = Text(None)
+    text.cache_writer = cache.writer('law')
+    text.add_lines(['Art. 1', 'Zweck'], '')
+    text.stop()
+    assert text.cache_writer is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,45 @@
+import pytest
+from collector import Collector, Text
+from treeindex import TreeIndex
+from synthetic import generate_collector
+from tests.edits import text, commands, run
+
+
+def check(index:TreeIndex, collector:Collector):
+    assert not index.stale
+    assert len(index.entries) == collector.length()
+    rebuilt = TreeIndex(collector)
+    rebuilt.sync()
+    for f in collector.sequence:
+        a = index.entries[f.id]
+        b = rebuilt.entries[f.id]
+        assert (a.pre, a.end, a.path) == (b.pre, b.end, b.path)
+    assert index.keys.keys() == rebuilt.keys.keys()
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_incremental_index_equals_rebuilt_one(seed):
+    collector = Collector('law.pdf', Text.from_lines(text(seed=seed)))
+    index = TreeIndex(collector)
+    index.sync()
+    for command in commands(200, seed):
+        run(collector, command)
+        check(index, collector)
+
+
+def test_subtree_is_a_contiguous_slice():
+    collector = generate_collector(300)
+    index = TreeIndex(collector)
+    for f in collector.sequence:
+        for d in index.descendants(f):
+            assert index.is_ancestor(f, d)
+            assert f.id in index.entry(d).path
+
+
+def test_resolve_citation():
+    collector = generate_collector(300)
+    index = TreeIndex(collector)
+    article = next(f for f in collector.sequence if f.type == Collector.ART and len(collector.get_children(f.id)) > 1)
+    absatz = collector.get_children(article.id)[1]
+    assert index.resolve('Art. {} Abs. {}'.format(article.ord, absatz.ord)) == [absatz]
+    assert index.resolve('Art. 9999') == []
@@ -0,0 +1,19 @@
+from validation import IncrementalValidator
+from synthetic import generate_collector
+
+
+def test_incremental_validation_follows_edits():
+    collector = generate_collector(100)
+    validator = IncrementalValidator(collector)
+    conforms, text = validator.validate(True)
+    assert conforms
+    f = next(f for f in collector.sequence if f.title is not None)
+    f.title = 'Art'
+    collector.changed(f)
+    conforms, text = validator.validate()
+    assert not conforms
+    assert f.id in validator.failed
+    f.title = 'Art. 1 Zweck'
+    collector.changed(f)
+    conforms, text = validator.validate()
+    assert conforms
@@ -0,0 +1,128 @@
+import hashlib
+import mmap
+import os
+import time
+from array import array
+
+
+class CachedLines:
+
+    def __init__(self, lines_path:str, index_path:str):
+        with open(index_path, 'rb') as f:
+            self.index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = memoryview(self.index_map).cast('Q')
+        with open(lines_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self.lines_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i:int) -> str:
+        if i < 0 or i >= len(self):
+            raise IndexError("line {} is beyond the end of the text".format(i))
+        return self.lines_map[self.offsets[i]:self.offsets[i+1]].decode('utf-8')
+
+    def close(self):
+        self.offsets.release()
+        self.index_map.close()
+        if isinstance(self.lines_map, mmap.mmap):
+            self.lines_map.close()
+
+
+class CacheWriter:
+
+    def __init__(self, cache, key:str):
+        self.cache = cache
+        self.key = key
+        self.lines_path = cache.lines_path(key) + '.' + str(os.getpid()) + '.tmp'
+        self.index_path = cache.index_path(key) + '.' + str(os.getpid()) + '.tmp'
+        self.lines_file = open(self.lines_path, 'wb')
+        self.offsets = array('Q', [0])
+        self.position = 0
+
+    def add(self, lines:list[str]):
+        for line in lines:
+            data = line.encode('utf-8')
+            self.lines_file.write(data)
+            self.position += len(data)
+            self.offsets.append(self.position)
+
+    def commit(self):
+        self.lines_file.close()
+        with open(self.index_path, 'wb') as f:
+            self.offsets.tofile(f)
+        os.replace(self.lines_path, self.cache.lines_path(self.key))
+        os.replace(self.index_path, self.cache.index_path(self.key))
+        self.cache.evict(keep=self.key)
+
+    def abort(self):
+        self.lines_file.close()
+        for path in [self.lines_path, self.index_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class TextCache:
+
+    DIRECTORY = os.environ.get('SEMANTICLAW_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'semanticlaw'))
+    MAX_BYTES = 512 * 2**20
+    STALE_SECONDS = 3600
+
+    def __init__(self, directory:str = None, max_bytes:int = MAX_BYTES):
+        self.directory = directory if directory is not None else self.DIRECTORY
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, pdf_filename:str, laparams) -> str:
+        h = hashlib.sha256()
+        with open(pdf_filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                h.update(chunk)
+        h.update(repr(sorted(vars(laparams).items())).encode('utf-8'))
+        return h.hexdigest()
+
+    def lines_path(self, key:str) -> str:
+        return os.path.join(self.directory, key + '.lines')
+
+    def index_path(self, key:str) -> str:
+        return os.path.join(self.directory, key + '.idx')
+
+    def get(self, key:str) -> CachedLines:
+        if not os.path.exists(self.index_path(key)) or not os.path.exists(self.lines_path(key)):
+            return None
+        os.utime(self.index_path(key))
+        return CachedLines(self.lines_path(key), self.index_path(key))
+
+    def writer(self, key:str) -> CacheWriter:
+        return CacheWriter(self, key)
+
+    def remove(self, key:str):
+        for path in [self.lines_path(key), self.index_path(key)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def entries(self) -> list[tuple]:
+        result = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp') and os.path.getmtime(path) < time.time() - self.STALE_SECONDS:
+                os.remove(path)
+            elif name.endswith('.idx'):
+                key = name[0:-4]
+                size = os.path.getsize(self.index_path(key))
+                if os.path.exists(self.lines_path(key)):
+                    size += os.path.getsize(self.lines_path(key))
+                result.append((os.path.getmtime(self.index_path(key)), size, key))
+        result.sort()
+        return result
+
+    def evict(self, keep:str = None):
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key != keep:
+                self.remove(key)
+                total -= size
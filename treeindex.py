@@ -0,0 +1,182 @@
+import argparse
+from collector import Collector, Frame, Text
+from references import CitationParser, CURRENT, load
+
+
+class Entry:
+
+    __slots__ = ('frame', 'pre', 'end', 'path', 'key')
+
+    def __init__(self, frame:Frame, pre:int, path:tuple):
+        self.frame = frame
+        self.pre = pre
+        self.end = pre
+        self.path = path
+        self.key = None
+
+    def depth(self) -> int:
+        return len(self.path) - 1
+
+
+class TreeIndex:
+
+    def __init__(self, collector:Collector):
+        self.collector = collector
+        self.entries = {}
+        self.keys = {}
+        self.articles = {}
+        self.parser = CitationParser()
+        self.stale = True
+        collector.add_observer(self)
+
+    def frame_changed(self, f:Frame):
+        if self.stale:
+            return
+        entry = self.entries.get(f.id)
+        if entry is None:
+            if len(self.entries) != self.collector.length() - 1 or self.collector.last() is not f:
+                self.stale = True
+                return
+            entry = self.add(f)
+        self.register(entry)
+
+    def frame_removed(self, f:Frame):
+        if self.stale:
+            return
+        entry = self.entries.get(f.id)
+        # the collector only ever removes the last frame of the sequence
+        if entry is None or entry.pre != len(self.entries) - 1:
+            self.stale = True
+            return
+        self.unregister(entry)
+        del self.entries[f.id]
+        for id in entry.path[0:-1]:
+            ancestor = self.entries[id]
+            if ancestor.end == entry.pre:
+                ancestor.end = entry.pre - 1
+
+    def state_loaded(self):
+        self.stale = True
+
+    def rebuild(self):
+        self.entries = {}
+        self.keys = {}
+        self.articles = {}
+        self.stale = False
+        for f in self.collector.sequence:
+            self.register(self.add(f))
+
+    def sync(self):
+        if self.stale or len(self.entries) != self.collector.length():
+            self.rebuild()
+
+    def add(self, f:Frame) -> Entry:
+        parent = self.entries.get(f.parent)
+        entry = Entry(f, len(self.entries), (parent.path if parent is not None else ()) + (f.id,))
+        self.entries[f.id] = entry
+        for id in entry.path[0:-1]:
+            self.entries[id].end = entry.pre
+        return entry
+
+    def register(self, entry:Entry):
+        f = entry.frame
+        key = (f.parent, f.type, str(f.ord)) if f.ord is not None else None
+        if key == entry.key:
+            return
+        self.unregister(entry)
+        entry.key = key
+        if key is None:
+            return
+        self.keys.setdefault(key, entry)
+        if f.type in [Collector.ART, Collector.PAR]:
+            self.articles.setdefault(str(f.ord), entry)
+
+    def unregister(self, entry:Entry):
+        if entry.key is None:
+            return
+        if self.keys.get(entry.key) is entry:
+            del self.keys[entry.key]
+        if self.articles.get(entry.key[2]) is entry:
+            del self.articles[entry.key[2]]
+        entry.key = None
+
+    def entry(self, f:Frame) -> Entry:
+        self.sync()
+        return self.entries.get(f.id)
+
+    def path(self, f:Frame) -> list[Frame]:
+        return [self.collector.get(id) for id in self.entry(f).path]
+
+    def is_ancestor(self, ancestor:Frame, f:Frame) -> bool:
+        a = self.entry(ancestor)
+        b = self.entry(f)
+        return a.pre < b.pre <= a.end
+
+    def subtree(self, f:Frame) -> list[Frame]:
+        entry = self.entry(f)
+        return self.collector.sequence[entry.pre:entry.end + 1]
+
+    def descendants(self, f:Frame) -> list[Frame]:
+        return self.subtree(f)[1:]
+
+    def child(self, parent:Frame, type:str, ord) -> Frame:
+        self.sync()
+        entry = self.keys.get((parent.id if parent is not None else None, type, str(ord)))
+        return entry.frame if entry is not None else None
+
+    def article(self, ord) -> Frame:
+        self.sync()
+        entry = self.articles.get(str(ord))
+        return entry.frame if entry is not None else None
+
+    def enclosing(self, f:Frame, types:list[str]) -> Frame:
+        for id in reversed(self.entry(f).path):
+            if self.collector.get(id).type in types:
+                return self.collector.get(id)
+        return None
+
+    def resolve_path(self, path:tuple, origin:Frame = None) -> Frame:
+        article, absatz, litera = path
+        if article == CURRENT or absatz == CURRENT:
+            if origin is None:
+                return None
+            frame = self.enclosing(origin, [Collector.ART, Collector.PAR])
+            if absatz == CURRENT:
+                frame = self.enclosing(origin, [Collector.ABS]) or frame
+        else:
+            frame = self.article(article)
+        if frame is not None and absatz not in (None, CURRENT):
+            frame = self.child(frame, Collector.ABS, absatz)
+        if frame is not None and litera is not None:
+            frame = self.child(frame, Collector.LIT, litera)
+        return frame
+
+    def resolve(self, citation:str, origin:Frame = None) -> list[Frame]:
+        result = []
+        for c in self.parser.parse(origin, citation):
+            for path in c.targets:
+                f = self.resolve_path(path, origin)
+                if f is not None:
+                    result.append(f)
+        return result
+
+    def describe(self, f:Frame) -> str:
+        return " > ".join(p.type + (" " + str(p.ord) if p.ord is not None else "") for p in self.path(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve citations such as 'Art. 5 Abs. 2 Bst. a' in a collected act.")
+    parser.add_argument('state', help="state file (.json or .state)")
+    parser.add_argument('citations', nargs='+', help="citations to resolve")
+    parser.add_argument('-s', '--subtree', action='store_true', help="also list the frames below each match")
+    args = parser.parse_args()
+    index = TreeIndex(load(args.state))
+    for citation in args.citations:
+        frames = index.resolve(citation)
+        if len(frames) == 0:
+            print(citation, "-> not found")
+        for f in frames:
+            print(citation, "->", f.id, index.describe(f), "[" + str(f.line_no) + "]")
+            if args.subtree:
+                for d in index.descendants(f):
+                    print("   ", "  " * (index.entry(d).depth() - index.entry(f).depth()) + d.id, d.type, d.ord)
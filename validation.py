@@ -0,0 +1,87 @@
+import os
+from rdflib import Graph
+from rdflib.namespace import SH
+from pyshacl import validate
+from collector import Collector, Frame, EX
+
+SHAPES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'swisslaw.ttl')
+
+shapes_cache = {}
+
+
+def load_shapes(file_name:str = SHAPES) -> Graph:
+    key = (os.path.abspath(file_name), os.path.getmtime(file_name))
+    graph = shapes_cache.get(key)
+    if graph is None:
+        graph = Graph().parse(file_name, format="ttl")
+        shapes_cache.clear()
+        shapes_cache[key] = graph
+    return graph
+
+
+class IncrementalValidator:
+
+    def __init__(self, collector:Collector, shapes_file:str = SHAPES):
+        self.collector = collector
+        self.shapes_file = shapes_file
+        self.model = None
+        self.data = None
+        self.dirty = {}
+        self.removed = set()
+        self.failed = set()
+        collector.add_observer(self)
+
+    def frame_changed(self, f:Frame):
+        self.dirty[f.id] = f
+
+    def frame_removed(self, f:Frame):
+        self.dirty.pop(f.id, None)
+        self.removed.add(f.id)
+
+    def state_loaded(self):
+        self.data = None
+
+    def rebuild(self):
+        self.model = load_shapes(self.shapes_file)
+        self.data = Graph()
+        self.data += self.model
+        self.data.addN((s, p, o, self.data) for s, p, o in self.collector.triples())
+        self.dirty = {}
+        self.removed = set()
+        self.failed = set()
+
+    def sync(self) -> set:
+        if self.data is None or self.model is not load_shapes(self.shapes_file):
+            self.rebuild()
+            return None
+        changed = set()
+        for id in self.removed:
+            self.data.remove((EX[id], None, None))
+        for f in self.dirty.values():
+            s = EX[f.id]
+            self.data.remove((s, None, None))
+            self.data.addN((s, p, o, self.data) for s, p, o in self.collector.frame_triples(f))
+            changed.add(f.id)
+            for id in [f.parent, f.prev, f.next]:
+                if id is not None:
+                    changed.add(id)
+        self.dirty = {}
+        self.removed = set()
+        return changed
+
+    def focus_nodes(self, changed:set) -> list:
+        ids = (changed | self.failed) - self.removed
+        return [EX[id] for id in ids if self.collector.get(id) is not None]
+
+    def validate(self, full:bool = False):
+        changed = self.sync()
+        if full or changed is None:
+            conforms, results, text = validate(self.data, shacl_graph=self.model)
+        else:
+            focus = self.focus_nodes(changed)
+            if len(focus) == 0:
+                return True, "Validation Report\nConforms: True\n(no changes since last validation)"
+            conforms, results, text = validate(self.data, shacl_graph=self.model, focus_nodes=focus)
+        prefix = str(EX)
+        self.failed = set(str(n)[len(prefix):] for n in results.objects(None, SH.focusNode) if str(n).startswith(prefix))
+        return conforms, text